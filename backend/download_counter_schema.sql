@@ -0,0 +1,15 @@
+-- Write-behind download counting
+-- The API coalesces download clicks per template in memory and flushes them
+-- with one call: a single UPDATE that adds each template's pending clicks
+-- atomically, so concurrent flushes or instances never lose increments.
+CREATE OR REPLACE FUNCTION increment_template_downloads(p_template_ids uuid[], p_increments integer[])
+RETURNS integer AS $$
+    WITH applied AS (
+        UPDATE templates t
+        SET downloads_count = COALESCE(t.downloads_count, 0) + d.increment
+        FROM unnest(p_template_ids, p_increments) AS d(template_id, increment)
+        WHERE t.id = d.template_id
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM applied;
+$$ LANGUAGE sql;
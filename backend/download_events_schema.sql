@@ -0,0 +1,148 @@
+-- Download event log with hourly and daily rollups
+-- The API flushes clicks coalesced per (template, minute); each flush appends
+-- those counts here and bumps downloads_count in the same transaction.
+-- Reports and trending read only the rollup tables.
+-- Requires increment_template_downloads from download_counter_schema.sql.
+
+CREATE TABLE IF NOT EXISTS download_events (
+    id BIGSERIAL PRIMARY KEY,
+    template_id UUID NOT NULL, -- no FK: the log outlives deleted templates
+    occurred_at TIMESTAMPTZ NOT NULL, -- minute the clicks happened
+    downloads INTEGER NOT NULL CHECK (downloads > 0),
+    recorded_at TIMESTAMPTZ NOT NULL DEFAULT NOW() -- when the batch reached the database
+);
+
+CREATE INDEX IF NOT EXISTS idx_download_events_occurred_at ON download_events(occurred_at);
+CREATE INDEX IF NOT EXISTS idx_download_events_recorded_at ON download_events(recorded_at);
+
+CREATE TABLE IF NOT EXISTS download_rollups_hourly (
+    template_id UUID NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    downloads INTEGER NOT NULL,
+    PRIMARY KEY (template_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS download_rollups_daily (
+    template_id UUID NOT NULL,
+    bucket DATE NOT NULL,
+    downloads INTEGER NOT NULL,
+    PRIMARY KEY (template_id, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_download_rollups_hourly_bucket ON download_rollups_hourly(bucket);
+CREATE INDEX IF NOT EXISTS idx_download_rollups_daily_bucket ON download_rollups_daily(bucket);
+
+-- Single-row watermark of the last rollup run
+CREATE TABLE IF NOT EXISTS download_rollup_state (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    last_run_at TIMESTAMPTZ NOT NULL DEFAULT 'epoch'
+);
+INSERT INTO download_rollup_state (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+-- One flush from the API: append the events and apply the per-template totals
+CREATE OR REPLACE FUNCTION record_download_batch(
+    p_template_ids uuid[],
+    p_minutes timestamptz[],
+    p_counts integer[]
+)
+RETURNS integer AS $$
+    INSERT INTO download_events (template_id, occurred_at, downloads)
+    SELECT e.template_id, e.occurred_at, e.downloads
+    FROM unnest(p_template_ids, p_minutes, p_counts) AS e(template_id, occurred_at, downloads)
+    WHERE EXISTS (SELECT 1 FROM templates t WHERE t.id = e.template_id);
+    
+    SELECT increment_template_downloads(array_agg(d.template_id), array_agg(d.downloads))
+    FROM (
+        SELECT e.template_id, sum(e.downloads)::integer AS downloads
+        FROM unnest(p_template_ids, p_counts) AS e(template_id, downloads)
+        GROUP BY e.template_id
+    ) d;
+$$ LANGUAGE sql;
+
+-- Recompute every hour (and day) that received events since the last run.
+-- Buckets are recomputed from scratch, so reruns and late journal replays are
+-- idempotent; raw events older than p_retain_days are pruned afterwards.
+CREATE OR REPLACE FUNCTION rollup_download_events(p_retain_days integer DEFAULT 30)
+RETURNS integer AS $$
+DECLARE
+    v_started TIMESTAMPTZ := clock_timestamp();
+    v_since TIMESTAMPTZ;
+    v_hours INTEGER;
+BEGIN
+    SELECT last_run_at INTO v_since FROM download_rollup_state WHERE id = 1 FOR UPDATE;
+    -- Overlap covers flush transactions that committed after the previous run read
+    v_since := v_since - INTERVAL '5 minutes';
+    
+    CREATE TEMP TABLE touched_hours ON COMMIT DROP AS
+    SELECT DISTINCT date_trunc('hour', e.occurred_at) AS bucket
+    FROM download_events e
+    WHERE e.recorded_at >= v_since
+      AND e.occurred_at >= v_started - make_interval(days => p_retain_days);
+    
+    SELECT count(*) INTO v_hours FROM touched_hours;
+    
+    DELETE FROM download_rollups_hourly r
+    USING touched_hours h
+    WHERE r.bucket = h.bucket;
+    
+    INSERT INTO download_rollups_hourly (template_id, bucket, downloads)
+    SELECT e.template_id, h.bucket, sum(e.downloads)
+    FROM touched_hours h
+    JOIN download_events e
+      ON e.occurred_at >= h.bucket AND e.occurred_at < h.bucket + INTERVAL '1 hour'
+    GROUP BY e.template_id, h.bucket;
+    
+    -- Days are rebuilt from their hourly rows
+    DELETE FROM download_rollups_daily r
+    WHERE r.bucket IN (SELECT DISTINCT (h.bucket AT TIME ZONE 'UTC')::date FROM touched_hours h);
+    
+    INSERT INTO download_rollups_daily (template_id, bucket, downloads)
+    SELECT r.template_id, (r.bucket AT TIME ZONE 'UTC')::date, sum(r.downloads)
+    FROM download_rollups_hourly r
+    WHERE (r.bucket AT TIME ZONE 'UTC')::date IN (
+        SELECT DISTINCT (h.bucket AT TIME ZONE 'UTC')::date FROM touched_hours h
+    )
+    GROUP BY r.template_id, (r.bucket AT TIME ZONE 'UTC')::date;
+    
+    DELETE FROM download_events
+    WHERE occurred_at < v_started - make_interval(days => p_retain_days)
+      AND recorded_at < v_since;
+    
+    UPDATE download_rollup_state SET last_run_at = v_started WHERE id = 1;
+    RETURN v_hours;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Download series from the rollups, for one template or the whole catalog
+CREATE OR REPLACE FUNCTION get_download_series(
+    p_granularity text,
+    p_since timestamptz,
+    p_template_id uuid DEFAULT NULL
+)
+RETURNS TABLE(bucket timestamptz, downloads bigint) AS $$
+    SELECT r.bucket, sum(r.downloads)
+    FROM download_rollups_hourly r
+    WHERE p_granularity = 'hour'
+      AND r.bucket >= date_trunc('hour', p_since)
+      AND (p_template_id IS NULL OR r.template_id = p_template_id)
+    GROUP BY r.bucket
+    UNION ALL
+    SELECT (r.bucket::timestamp AT TIME ZONE 'UTC'), sum(r.downloads)
+    FROM download_rollups_daily r
+    WHERE p_granularity = 'day'
+      AND r.bucket >= (p_since AT TIME ZONE 'UTC')::date
+      AND (p_template_id IS NULL OR r.template_id = p_template_id)
+    GROUP BY r.bucket
+    ORDER BY 1;
+$$ LANGUAGE sql STABLE;
+
+-- Templates with the most downloads since a point in time (trending rail)
+CREATE OR REPLACE FUNCTION get_top_downloads_since(p_since timestamptz, p_limit integer DEFAULT 100)
+RETURNS TABLE(template_id uuid, downloads bigint) AS $$
+    SELECT r.template_id, sum(r.downloads)
+    FROM download_rollups_hourly r
+    WHERE r.bucket >= date_trunc('hour', p_since)
+    GROUP BY r.template_id
+    ORDER BY 2 DESC
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
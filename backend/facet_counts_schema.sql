@@ -0,0 +1,37 @@
+-- Filter-aware facet counts for /api/facets
+-- Applies the same filters as the template listing and returns one row per
+-- facet value with the number of published templates that carry it. The
+-- category/tool filters use the GIN indexes on templates.categories/tools.
+-- The search filter needs search_vector from search_schema.sql.
+CREATE OR REPLACE FUNCTION get_template_facet_counts(
+    p_search text DEFAULT NULL,
+    p_platform text DEFAULT NULL,
+    p_category text DEFAULT NULL,
+    p_tool text DEFAULT NULL
+)
+RETURNS TABLE(facet text, value text, count bigint) AS $$
+    WITH filtered AS (
+        SELECT t.platform, t.categories, t.tools
+        FROM templates t
+        WHERE t.status = 'published'
+          AND (p_platform IS NULL OR t.platform = p_platform)
+          AND (p_category IS NULL OR t.categories @> ARRAY[p_category])
+          AND (p_tool IS NULL OR t.tools @> ARRAY[p_tool])
+          AND (
+              p_search IS NULL
+              OR t.search_vector @@ websearch_to_tsquery('portuguese_unaccent', p_search)
+          )
+    )
+    SELECT 'platform'::text, f.platform, count(*)
+    FROM filtered f
+    GROUP BY f.platform
+    UNION ALL
+    SELECT 'category'::text, c.value, count(*)
+    FROM filtered f CROSS JOIN LATERAL unnest(f.categories) AS c(value)
+    GROUP BY c.value
+    UNION ALL
+    SELECT 'tool'::text, tl.value, count(*)
+    FROM filtered f CROSS JOIN LATERAL unnest(f.tools) AS tl(value)
+    GROUP BY tl.value
+    ORDER BY 1, 3 DESC, 2;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,49 @@
+-- Atomic favorite toggle and bulk favorites sync
+
+-- Toggle in one statement: delete the favorite if it exists, otherwise
+-- insert it. Returns true when the template is now favorited.
+CREATE OR REPLACE FUNCTION toggle_favorite(p_user_id text, p_template_id uuid)
+RETURNS boolean AS $$
+    WITH removed AS (
+        DELETE FROM favorites
+        WHERE user_id = p_user_id AND template_id = p_template_id
+        RETURNING 1
+    ),
+    added AS (
+        INSERT INTO favorites (user_id, template_id)
+        SELECT p_user_id, p_template_id
+        WHERE NOT EXISTS (SELECT 1 FROM removed)
+        ON CONFLICT (user_id, template_id) DO NOTHING
+        RETURNING 1
+    )
+    SELECT NOT EXISTS (SELECT 1 FROM removed);
+$$ LANGUAGE sql;
+
+-- Apply a client's pending adds and removes in one transaction and return the
+-- resulting favorite set. An id in both lists is kept; unknown ids are ignored.
+CREATE OR REPLACE FUNCTION sync_favorites(p_user_id text, p_add uuid[], p_remove uuid[])
+RETURNS TABLE(added integer, removed integer, template_ids uuid[]) AS $$
+#variable_conflict use_column
+DECLARE
+    v_added INTEGER;
+    v_removed INTEGER;
+BEGIN
+    DELETE FROM favorites f
+    WHERE f.user_id = p_user_id
+      AND f.template_id = ANY(p_remove)
+      AND NOT (f.template_id = ANY(p_add));
+    GET DIAGNOSTICS v_removed = ROW_COUNT;
+    
+    INSERT INTO favorites (user_id, template_id)
+    SELECT p_user_id, t.id
+    FROM templates t
+    WHERE t.id = ANY(p_add)
+    ON CONFLICT (user_id, template_id) DO NOTHING;
+    GET DIAGNOSTICS v_added = ROW_COUNT;
+    
+    RETURN QUERY
+    SELECT v_added, v_removed, COALESCE(array_agg(f.template_id ORDER BY f.created_at), '{}'::uuid[])
+    FROM favorites f
+    WHERE f.user_id = p_user_id;
+END;
+$$ LANGUAGE plpgsql;
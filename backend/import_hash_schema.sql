@@ -0,0 +1,4 @@
+-- Content hash for CSV import change detection
+-- Stores a hash of each template's importable fields so re-importing the same
+-- sheet can skip rows that did not change instead of rewriting them.
+ALTER TABLE templates ADD COLUMN IF NOT EXISTS content_hash TEXT;
@@ -0,0 +1,45 @@
+-- Import jobs and write leases shared by every API worker
+-- Job status is stored here so GET /api/import/jobs/{id} answers from any
+-- worker, not only the one that accepted the upload.
+-- PostgREST runs each RPC on a pooled connection, so session advisory locks
+-- cannot be held across requests; cross-worker mutual exclusion uses a lease
+-- row instead. The holder renews it while it writes and deletes it when done;
+-- a worker that dies lets it expire after p_ttl_seconds.
+
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id UUID PRIMARY KEY,
+    status TEXT NOT NULL CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    job JSONB NOT NULL, -- the API's ImportJob model, progress and report included
+    created_at TIMESTAMPTZ DEFAULT NOW(), -- finished jobs are purged by age
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_import_jobs_created_at ON import_jobs(created_at);
+
+CREATE TABLE IF NOT EXISTS write_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+-- Takes the lease if it is free or expired, renews it if p_holder already
+-- has it; returns whether p_holder holds it now
+CREATE OR REPLACE FUNCTION try_acquire_write_lease(p_name TEXT, p_holder TEXT, p_ttl_seconds INTEGER)
+RETURNS BOOLEAN AS $$
+DECLARE
+    acquired BOOLEAN;
+BEGIN
+    INSERT INTO write_leases AS l (name, holder, expires_at)
+    VALUES (p_name, p_holder, NOW() + make_interval(secs => p_ttl_seconds))
+    ON CONFLICT (name) DO UPDATE
+        SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+        WHERE l.holder = EXCLUDED.holder OR l.expires_at < NOW()
+    RETURNING true INTO acquired;
+    RETURN coalesce(acquired, false);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION release_write_lease(p_name TEXT, p_holder TEXT)
+RETURNS VOID AS $$
+    DELETE FROM write_leases WHERE name = p_name AND holder = p_holder;
+$$ LANGUAGE sql;
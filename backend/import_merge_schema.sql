@@ -0,0 +1,172 @@
+-- Atomic, set-based CSV import
+-- The API stages validated rows in template_import_staging (one insert per
+-- chunk) and then calls merge_template_import once. The function runs in a
+-- single transaction: if any staged row is invalid nothing is applied and
+-- only the error rows are returned.
+
+CREATE TABLE IF NOT EXISTS template_import_staging (
+    import_id UUID NOT NULL,
+    line_number INTEGER NOT NULL,
+    action TEXT NOT NULL CHECK (action IN ('upsert', 'delete')),
+    slug TEXT NOT NULL,
+    data JSONB NOT NULL DEFAULT '{}', -- templates payload built by the API for upserts
+    created_at TIMESTAMPTZ DEFAULT NOW(), -- leftovers of crashed imports can be purged by age
+    PRIMARY KEY (import_id, line_number)
+);
+
+-- Returns one row per staged line:
+--   outcome = inserted | updated | unchanged | deleted | error
+-- Lines are replayed in file order, the same way the non-atomic import
+-- applies them, so a slug that appears more than once (e.g. upsert then
+-- delete, or delete then re-insert) gives the same outcomes in both modes.
+CREATE OR REPLACE FUNCTION merge_template_import(p_import_id UUID)
+RETURNS TABLE(line_number integer, slug text, outcome text, message text) AS $$
+#variable_conflict use_column
+DECLARE
+    staged record;
+    state record;
+    error_count integer;
+BEGIN
+    -- One row per slug: the catalog row it started from and its state so far
+    CREATE TEMP TABLE _import_rows ON COMMIT DROP AS
+    SELECT DISTINCT ON (s.slug)
+        s.slug,
+        t.id AS existing_id,
+        t.id IS NOT NULL AS present,
+        t.content_hash AS current_hash,
+        false AS original_deleted,
+        NULL::jsonb AS data
+    FROM template_import_staging s
+    LEFT JOIN templates t ON t.slug = s.slug
+    WHERE s.import_id = p_import_id
+    ORDER BY s.slug;
+    ALTER TABLE _import_rows ADD PRIMARY KEY (slug);
+
+    CREATE TEMP TABLE _import_outcomes (
+        line_number integer, slug text, outcome text, message text
+    ) ON COMMIT DROP;
+
+    FOR staged IN
+        SELECT s.line_number, s.action, s.slug, s.data
+        FROM template_import_staging s
+        WHERE s.import_id = p_import_id
+        ORDER BY s.line_number
+    LOOP
+        SELECT * INTO state FROM _import_rows r WHERE r.slug = staged.slug;
+
+        IF staged.action = 'delete' THEN
+            IF NOT state.present THEN
+                INSERT INTO _import_outcomes VALUES (staged.line_number, staged.slug, 'error',
+                    format('Template com slug ''%s'' não encontrado para exclusão', staged.slug));
+            ELSE
+                UPDATE _import_rows r SET
+                    present = false,
+                    current_hash = NULL,
+                    data = NULL,
+                    original_deleted = r.original_deleted OR r.existing_id IS NOT NULL
+                WHERE r.slug = staged.slug;
+                INSERT INTO _import_outcomes VALUES (staged.line_number, staged.slug, 'deleted', NULL);
+            END IF;
+        ELSIF coalesce(staged.data->>'platform', '') = '' THEN
+            INSERT INTO _import_outcomes VALUES (staged.line_number, staged.slug, 'error', 'Plataforma é obrigatória');
+        ELSIF staged.data->>'status' NOT IN ('draft', 'published', 'archived') THEN
+            INSERT INTO _import_outcomes VALUES (staged.line_number, staged.slug, 'error',
+                format('Status inválido: %s (deve ser draft, published ou archived)', staged.data->>'status'));
+        ELSIF state.present AND state.current_hash IS NOT DISTINCT FROM staged.data->>'content_hash' THEN
+            INSERT INTO _import_outcomes VALUES (staged.line_number, staged.slug, 'unchanged', NULL);
+        ELSE
+            UPDATE _import_rows r SET
+                present = true,
+                current_hash = staged.data->>'content_hash',
+                data = staged.data
+            WHERE r.slug = staged.slug;
+            INSERT INTO _import_outcomes VALUES (staged.line_number, staged.slug,
+                CASE WHEN state.present THEN 'updated' ELSE 'inserted' END, NULL);
+        END IF;
+    END LOOP;
+
+    SELECT count(*) INTO error_count FROM _import_outcomes o WHERE o.outcome = 'error';
+
+    IF error_count > 0 THEN
+        RETURN QUERY
+        SELECT o.line_number, o.slug, o.outcome, o.message
+        FROM _import_outcomes o
+        WHERE o.outcome = 'error'
+        ORDER BY o.line_number;
+
+        DELETE FROM template_import_staging s WHERE s.import_id = p_import_id;
+        RETURN;
+    END IF;
+
+    -- Net effect per slug: deletes of the original row first, then writes
+    -- of the final state (a re-inserted slug gets a fresh row, as it does in
+    -- the non-atomic import)
+    DELETE FROM templates t
+    USING _import_rows r
+    WHERE r.original_deleted AND t.id = r.existing_id;
+
+    UPDATE templates t SET
+        title = r.data->>'title',
+        description = r.data->>'description',
+        platform = r.data->>'platform',
+        author_name = r.data->>'author_name',
+        author_email = r.data->>'author_email',
+        tutorial_url = r.data->>'tutorial_url',
+        preview_image_url = r.data->>'preview_image_url',
+        download_url = r.data->>'download_url',
+        json_url = r.data->>'json_url',
+        language = r.data->>'language',
+        status = r.data->>'status',
+        tags = r.data->>'tags',
+        notes = r.data->>'notes',
+        external_id = r.data->>'external_id',
+        categories = ARRAY(SELECT jsonb_array_elements_text(r.data->'categories')),
+        tools = ARRAY(SELECT jsonb_array_elements_text(r.data->'tools')),
+        rating_avg = CASE WHEN r.data ? 'rating_avg' THEN (r.data->>'rating_avg')::decimal ELSE t.rating_avg END,
+        downloads_count = CASE WHEN r.data ? 'downloads_count' THEN (r.data->>'downloads_count')::integer ELSE t.downloads_count END,
+        content_hash = r.data->>'content_hash',
+        updated_at = NOW()
+    FROM _import_rows r
+    WHERE t.id = r.existing_id
+      AND NOT r.original_deleted
+      AND r.data IS NOT NULL;
+
+    INSERT INTO templates (
+        slug, title, description, platform, author_name, author_email,
+        tutorial_url, preview_image_url, download_url, json_url, language,
+        status, tags, notes, external_id, categories, tools, rating_avg,
+        downloads_count, content_hash
+    )
+    SELECT
+        r.slug,
+        r.data->>'title',
+        r.data->>'description',
+        r.data->>'platform',
+        r.data->>'author_name',
+        r.data->>'author_email',
+        r.data->>'tutorial_url',
+        r.data->>'preview_image_url',
+        r.data->>'download_url',
+        r.data->>'json_url',
+        r.data->>'language',
+        r.data->>'status',
+        r.data->>'tags',
+        r.data->>'notes',
+        r.data->>'external_id',
+        ARRAY(SELECT jsonb_array_elements_text(r.data->'categories')),
+        ARRAY(SELECT jsonb_array_elements_text(r.data->'tools')),
+        (r.data->>'rating_avg')::decimal,
+        coalesce((r.data->>'downloads_count')::integer, 0),
+        r.data->>'content_hash'
+    FROM _import_rows r
+    WHERE r.data IS NOT NULL
+      AND (r.existing_id IS NULL OR r.original_deleted);
+
+    RETURN QUERY
+    SELECT o.line_number, o.slug, o.outcome, o.message
+    FROM _import_outcomes o
+    ORDER BY o.line_number;
+
+    DELETE FROM template_import_staging s WHERE s.import_id = p_import_id;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,6 @@
+-- Keyset pagination for /api/templates?cursor=...
+-- Matches ORDER BY downloads_count DESC, id DESC so each cursor page is an
+-- index range scan starting right after the previous page's last row.
+CREATE INDEX IF NOT EXISTS idx_templates_published_downloads_id
+    ON templates (downloads_count DESC, id DESC)
+    WHERE status = 'published';
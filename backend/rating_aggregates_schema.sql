@@ -0,0 +1,76 @@
+-- Incremental rating aggregates
+-- Replaces the AVG() recomputation trigger from favorites_ratings_schema.sql:
+-- each rating insert/update/delete now applies an O(1) delta to the
+-- template's running sum, count and per-star histogram, and rating_avg is
+-- derived from those. The API ranks by a Bayesian score built on them.
+
+ALTER TABLE templates ADD COLUMN IF NOT EXISTS rating_sum BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE templates ADD COLUMN IF NOT EXISTS rating_count INTEGER NOT NULL DEFAULT 0;
+-- rating_histogram[n] = number of n-star ratings
+ALTER TABLE templates ADD COLUMN IF NOT EXISTS rating_histogram INTEGER[] NOT NULL DEFAULT '{0,0,0,0,0}';
+
+-- Backfill from the existing ratings
+UPDATE templates t
+SET rating_sum = a.rating_sum,
+    rating_count = a.rating_count,
+    rating_histogram = a.rating_histogram,
+    rating_avg = ROUND(a.rating_sum::numeric / a.rating_count, 2)
+FROM (
+    SELECT template_id,
+           SUM(rating) AS rating_sum,
+           COUNT(*) AS rating_count,
+           ARRAY[
+               COUNT(*) FILTER (WHERE rating = 1),
+               COUNT(*) FILTER (WHERE rating = 2),
+               COUNT(*) FILTER (WHERE rating = 3),
+               COUNT(*) FILTER (WHERE rating = 4),
+               COUNT(*) FILTER (WHERE rating = 5)
+           ]::integer[] AS rating_histogram
+    FROM ratings
+    GROUP BY template_id
+) a
+WHERE a.template_id = t.id;
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one rating from a template's aggregates
+CREATE OR REPLACE FUNCTION apply_template_rating_delta(p_template_id uuid, p_rating integer, p_sign integer)
+RETURNS void AS $$
+    UPDATE templates
+    SET rating_sum = rating_sum + p_sign * p_rating,
+        rating_count = rating_count + p_sign,
+        rating_histogram[p_rating] = rating_histogram[p_rating] + p_sign,
+        rating_avg = CASE
+            WHEN rating_count + p_sign > 0
+            THEN ROUND((rating_sum + p_sign * p_rating)::numeric / (rating_count + p_sign), 2)
+        END
+    WHERE id = p_template_id;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION update_template_rating_aggregates()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND NEW.template_id = OLD.template_id
+       AND NEW.rating = OLD.rating THEN
+        RETURN NEW;
+    END IF;
+    
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_template_rating_delta(OLD.template_id, OLD.rating, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_template_rating_delta(NEW.template_id, NEW.rating, 1);
+    END IF;
+    
+    RETURN COALESCE(NEW, OLD);
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_rating_avg_insert ON ratings;
+DROP TRIGGER IF EXISTS trigger_update_rating_avg_update ON ratings;
+DROP TRIGGER IF EXISTS trigger_update_rating_avg_delete ON ratings;
+DROP TRIGGER IF EXISTS trigger_update_rating_aggregates ON ratings;
+
+CREATE TRIGGER trigger_update_rating_aggregates
+    AFTER INSERT OR UPDATE OR DELETE ON ratings
+    FOR EACH ROW
+    EXECUTE FUNCTION update_template_rating_aggregates();
@@ -0,0 +1,68 @@
+-- Full-text search for templates
+-- Portuguese stemming with accent folding, a generated tsvector column kept in
+-- sync by Postgres, a GIN index over it and a ranked search function used by
+-- /api/templates?search=...
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- Text search configuration: unaccent first, then the Portuguese stemmer
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'portuguese_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION portuguese_unaccent (COPY = portuguese);
+        ALTER TEXT SEARCH CONFIGURATION portuguese_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+    END IF;
+END
+$$;
+
+-- Weighted document: title > tags > description > author/platform
+ALTER TABLE templates ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese_unaccent'::regconfig, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('portuguese_unaccent'::regconfig, coalesce(tags, '')), 'B') ||
+        setweight(to_tsvector('portuguese_unaccent'::regconfig, coalesce(description, '')), 'C') ||
+        setweight(to_tsvector('portuguese_unaccent'::regconfig, coalesce(author_name, '') || ' ' || coalesce(platform, '')), 'D')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_templates_search_vector ON templates USING GIN(search_vector);
+
+-- Ranked search: one row per match with the template as JSON, its rank and the
+-- total number of matches. A page past the last match returns a single row
+-- with a NULL template, so the total is still reported.
+CREATE OR REPLACE FUNCTION search_templates(
+    p_query text,
+    p_platform text DEFAULT NULL,
+    p_category text DEFAULT NULL,
+    p_tool text DEFAULT NULL,
+    p_limit integer DEFAULT 15,
+    p_offset integer DEFAULT 0
+)
+RETURNS TABLE(template jsonb, rank real, total bigint) AS $$
+    WITH q AS (
+        SELECT websearch_to_tsquery('portuguese_unaccent', p_query) AS query
+    ),
+    matched AS (
+        SELECT t.*, ts_rank_cd(t.search_vector, q.query) AS search_rank
+        FROM templates t, q
+        WHERE t.status = 'published'
+          AND t.search_vector @@ q.query
+          AND (p_platform IS NULL OR t.platform = p_platform)
+          AND (p_category IS NULL OR t.categories @> ARRAY[p_category])
+          AND (p_tool IS NULL OR t.tools @> ARRAY[p_tool])
+    ),
+    page AS (
+        SELECT to_jsonb(m) - 'search_vector' - 'search_rank' AS template,
+            m.search_rank, m.downloads_count, m.id
+        FROM matched m
+        ORDER BY m.search_rank DESC, m.downloads_count DESC, m.id DESC
+        LIMIT p_limit OFFSET p_offset
+    ),
+    counted AS (
+        SELECT count(*) AS total FROM matched
+    )
+    SELECT p.template, p.search_rank, c.total
+    FROM counted c
+    LEFT JOIN page p ON true
+    ORDER BY p.search_rank DESC, p.downloads_count DESC, p.id DESC;
+$$ LANGUAGE sql STABLE;
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Query, UploadFile, File, Form, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from supabase import create_client, Client
@@ -7,14 +7,29 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
 import re
-from datetime import datetime, timezone
+import base64
+import bisect
+import heapq
+import unicodedata
+import json
+import hashlib
+import secrets
+from collections import OrderedDict, deque
+from datetime import datetime, timezone, timedelta
 import pandas as pd
-from io import StringIO
+import numpy as np
+from io import BytesIO
 import asyncio
-import requests
+import httpx
+import shutil
+import tempfile
+import threading
+import time
+import fcntl
+import socket
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -24,6 +39,50 @@ supabase_url = os.environ['SUPABASE_URL']
 supabase_key = os.environ['SUPABASE_SERVICE_KEY']
 supabase: Client = create_client(supabase_url, supabase_key)
 
+# Bulk import tuning
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', '500'))
+SLUG_LOOKUP_BATCH_SIZE = 200  # keeps in_() filters well under URL length limits
+CONTENT_HASH_EXCLUDED_FIELDS = {'id', 'created_at', 'updated_at', 'content_hash'}
+IMPORT_JOB_HISTORY = 50  # finished jobs this worker keeps in memory; the import_jobs table has them all
+IMPORT_JOB_RETENTION_DAYS = 7  # finished jobs older than this are purged from the import_jobs table
+# Cross-worker import lock (a lease row, see import_jobs_schema.sql)
+WRITE_LEASE_TTL_SECONDS = 60
+WRITE_LEASE_POLL_SECONDS = 1.0
+PREVIEW_TOKEN_TTL_SECONDS = int(os.environ.get('PREVIEW_TOKEN_TTL_SECONDS', '900'))
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get('PREVIEW_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+# Google Sheets fetching
+SHEET_FETCH_MAX_BYTES = int(os.environ.get('SHEET_FETCH_MAX_MB', '50')) * 1024 * 1024
+SHEET_CACHE_SIZE = 8  # sheets whose last download (and parsed frame) is kept for conditional GETs
+SHEET_SYNC_URLS = [url.strip() for url in os.environ.get('SHEET_SYNC_URLS', '').split(',') if url.strip()]
+SHEET_SYNC_INTERVAL_SECONDS = int(os.environ.get('SHEET_SYNC_INTERVAL_SECONDS', '600'))  # 0 disables the scheduler
+SHEET_SYNC_HISTORY = 100
+
+# In-memory catalog read caches
+CATALOG_CACHE_TTL_SECONDS = int(os.environ.get('CATALOG_CACHE_TTL_SECONDS', '300'))
+# Browser/proxy freshness for catalog GETs; revalidation after that is a cheap 304
+CATALOG_MAX_AGE_SECONDS = int(os.environ.get('CATALOG_MAX_AGE_SECONDS', '60'))
+# Home-page rails (featured, trending, newest, most downloaded) kept in memory
+RANKED_LIST_SIZE = 24
+RANKED_LISTS_REFRESH_SECONDS = int(os.environ.get('RANKED_LISTS_REFRESH_SECONDS', '300'))
+RANKED_LISTS_POLL_SECONDS = 5  # how soon a catalog write reaches the rails
+# Bayesian rating: every template starts with this many virtual votes at the catalog mean
+RATING_PRIOR_WEIGHT = float(os.environ.get('RATING_PRIOR_WEIGHT', '10'))
+RATING_PRIOR_MEAN_DEFAULT = 3.0  # used until the catalog has any votes
+# Write-behind download counting
+DOWNLOAD_FLUSH_INTERVAL_SECONDS = float(os.environ.get('DOWNLOAD_FLUSH_INTERVAL_SECONDS', '10'))
+# One journal per worker process lives in this directory
+DOWNLOAD_JOURNAL_DIR = Path(os.environ.get('DOWNLOAD_JOURNAL_DIR', str(ROOT_DIR / 'download_journal')))
+DOWNLOAD_ROLLUP_INTERVAL_SECONDS = int(os.environ.get('DOWNLOAD_ROLLUP_INTERVAL_SECONDS', '300'))
+TRENDING_WINDOW_HOURS = 24
+FAVORITES_SYNC_MAX_IDS = 500  # per list in one bulk favorites sync
+# Per-user favorite sets and rating maps kept in memory
+USER_DATA_CACHE_SIZE = int(os.environ.get('USER_DATA_CACHE_SIZE', '1000'))
+USER_DATA_CACHE_TTL_SECONDS = int(os.environ.get('USER_DATA_CACHE_TTL_SECONDS', '120'))
+USER_DATA_LOAD_PAGE_SIZE = 1000  # PostgREST's default max-rows; full loads page through it
+# Serve unsearched listings from an in-process columnar copy of the published catalog
+CATALOG_INDEX_ENABLED = os.environ.get('CATALOG_INDEX_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -61,6 +120,10 @@ class Template(BaseModel):
     language: str = "pt-BR"
     status: str = "draft"  # draft, published, archived
     rating_avg: Optional[float] = None
+    rating_sum: int = 0
+    rating_count: int = 0
+    rating_histogram: Optional[List[int]] = None  # [1-star count, ..., 5-star count]
+    rating_score: Optional[float] = None  # Bayesian-weighted rating, set on ranked lists
     downloads_count: int = 0
     tags: Optional[str] = None
     notes: Optional[str] = None
@@ -94,6 +157,12 @@ class Template(BaseModel):
             raise ValueError('URL deve começar com http:// ou https://')
         return v
 
+# Template columns read back for API responses: never select('*') on templates,
+# it would ship search_vector (a large tsvector) with every row
+TEMPLATE_SELECT_COLUMNS = ', '.join(
+    name for name in Template.__fields__ if name != 'rating_score'
+)
+
 # New models for favorites and ratings
 class Favorite(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -117,14 +186,46 @@ class ImportReport(BaseModel):
     inserted: int = 0
     updated: int = 0
     deleted: int = 0
+    unchanged: int = 0
     errors: List[str] = []
 
+class SheetSyncRun(BaseModel):
+    sheet_url: str
+    status: str = "running"  # running|completed|not_modified|failed
+    started_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    duration_seconds: Optional[float] = None
+    rows_total: int = 0
+    rows_changed: int = 0  # rows that differed from the last synced snapshot
+    report: ImportReport = Field(default_factory=ImportReport)
+    error: Optional[str] = None
+
+class SheetSyncStatus(BaseModel):
+    sheets: List[str]
+    interval_seconds: int
+    history: List[SheetSyncRun]
+
+class ImportJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    filename: str
+    atomic: bool = False
+    status: str = "queued"  # queued|running|completed|failed
+    total_bytes: int = 0
+    bytes_processed: int = 0
+    rows_processed: int = 0
+    rows_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    report: ImportReport = Field(default_factory=ImportReport)
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 class PreviewRow(BaseModel):
     line_number: int
     slug: str
     title: str
     action: str
-    status: str  # insert|update|delete|error
+    status: str  # insert|update|unchanged|delete|error
     message: str
     data: Dict[str, Any] = {}
 
@@ -132,97 +233,193 @@ class PreviewReport(BaseModel):
     total_rows: int = 0
     insert_count: int = 0
     update_count: int = 0
+    unchanged_count: int = 0
     delete_count: int = 0
     error_count: int = 0
     rows: List[PreviewRow] = []
+    preview_token: Optional[str] = None  # pass to /api/import/commit to apply this preview
+    preview_expires_at: Optional[datetime] = None
 
 class PaginatedTemplateResponse(BaseModel):
-    items: List[Template]
+    items: List[TemplateWithUserData]
     total: int
     page: int
     page_size: int
     total_pages: int
     facets: Dict[str, List[str]]
+    next_cursor: Optional[str] = None
 
 class TemplateFacets(BaseModel):
     platforms: List[str]
     categories: List[str] 
     tools: List[str]
 
+class Suggestion(BaseModel):
+    kind: str  # title | tag | tool | category
+    value: str
+    slug: Optional[str] = None  # set for titles
+
+class FavoritesSyncRequest(BaseModel):
+    add: List[str] = Field(default_factory=list, max_length=FAVORITES_SYNC_MAX_IDS)
+    remove: List[str] = Field(default_factory=list, max_length=FAVORITES_SYNC_MAX_IDS)
+
+class FavoritesSyncResult(BaseModel):
+    added: int
+    removed: int
+    template_ids: List[str]
+
+class UserDataCacheStats(BaseModel):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+
+class DownloadBucket(BaseModel):
+    bucket: datetime
+    downloads: int
+
+class DownloadSeries(BaseModel):
+    granularity: str  # hour | day
+    template_id: Optional[str] = None  # None = whole catalog
+    total: int
+    buckets: List[DownloadBucket]
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class TemplateFacetCounts(BaseModel):
+    platforms: List[FacetCount] = []
+    categories: List[FacetCount] = []
+    tools: List[FacetCount] = []
+
+# Catalog version: bumped on every write to templates so in-memory read caches
+# can tell they are stale. It is per worker process, so caches also expire after
+# CATALOG_CACHE_TTL_SECONDS to pick up writes made by other workers.
+catalog_version = 0
+catalog_version_lock = threading.Lock()
+
+def bump_catalog_version() -> int:
+    """Mark the catalog as changed (safe to call from import worker threads)"""
+    global catalog_version
+    with catalog_version_lock:
+        catalog_version += 1
+        return catalog_version
+
+# Download flushes only move downloads_count, which nothing but listing order
+# and the rails depend on; they get their own counter so facets, suggestions
+# and ETags survive steady download traffic
+downloads_version = 0
+
+def bump_downloads_version() -> int:
+    global downloads_version
+    with catalog_version_lock:
+        downloads_version += 1
+        return downloads_version
+
+def ranking_version() -> Tuple[int, int]:
+    """Version for caches that depend on download counts as well as catalog content"""
+    return catalog_version, downloads_version
+
+# The boot id keeps ETags from different processes and restarts apart; the
+# TTL bucket bounds how long a tag survives edits made outside this API
+CATALOG_ETAG_BOOT_ID = secrets.token_hex(4)
+
+def catalog_etag(with_downloads: bool = False) -> str:
+    """Weak ETag for catalog reads; with_downloads for bodies that show or sort by downloads_count"""
+    bucket = int(time.time() // max(CATALOG_CACHE_TTL_SECONDS, 1))
+    version = '.'.join(map(str, ranking_version())) if with_downloads else catalog_version
+    return f'W/"{CATALOG_ETAG_BOOT_ID}-{version}-{bucket}"'
+
+def catalog_not_modified(request: Request, response: Response, etag: Optional[str] = None) -> Optional[Response]:
+    """Tag a catalog response; returns a 304 to send instead when the client's copy is current
+    
+    etag defaults to catalog_etag(); responses served from a snapshot pass the snapshot's own tag.
+    """
+    etag = etag or catalog_etag()
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={CATALOG_MAX_AGE_SECONDS}, must-revalidate"}
+    response.headers.update(headers)
+    
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        # Weak comparison, as If-None-Match requires
+        candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        if '*' in candidates or etag.removeprefix('W/') in candidates:
+            return Response(status_code=304, headers=headers)
+    return None
+
 # CSV Import utilities (same as before)
-def safe_str_strip(value) -> str:
-    """Safely convert value to string and strip, handling NaN and None"""
-    if value is None or pd.isna(value):
-        return ''
-    return str(value).strip()
-
-def safe_str_strip_or_none(value) -> Optional[str]:
-    """Safely convert value to string and strip, return None if empty"""
-    result = safe_str_strip(value)
-    return result if result else None
-
-def parse_pipe_separated(value: str) -> List[str]:
-    """Parse pipe-separated values and return list"""
-    if not value or pd.isna(value):
-        return []
-    return [v.strip() for v in str(value).split('|') if v.strip()]
-
-def validate_template_data(row: Dict[str, Any]) -> List[str]:
-    """Validate template data and return list of errors - RELAXED VALIDATION"""
-    errors = []
+TEMPLATE_TEXT_COLUMNS = [
+    'slug', 'title', 'description', 'platform', 'author_name', 'author_email',
+    'tutorial_url', 'preview_image_url', 'download_url', 'json_url',
+    'language', 'status', 'tags', 'notes', 'external_id'
+]
+TEMPLATE_URL_COLUMNS = ['tutorial_url', 'preview_image_url', 'download_url', 'json_url']
+TEMPLATE_LIST_COLUMNS = ['categories', 'tools']
+
+def normalize_text_column(series: pd.Series) -> pd.Series:
+    """Convert a column to stripped strings, mapping NaN/None to ''"""
+    return series.astype('string').str.strip().fillna('').astype(object)
+
+def validate_template_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Validate and normalize a whole CSV chunk column by column - RELAXED VALIDATION
+    
+    Text columns are stripped (NaN -> ''), pipe-separated columns become lists,
+    URLs that look like domains get https:// prepended, ratings are clamped to
+    0-5 and downloads coerced to non-negative integers. Returns the normalized
+    frame and an object array with each row's list of validation errors.
+    """
+    errors = np.empty(len(df), dtype=object)
+    errors[:] = [[] for _ in range(len(df))]
+    
+    def flag(mask, message: str, values=None):
+        for i in np.flatnonzero(np.asarray(mask)):
+            errors[i].append(message.format(values[i]) if values is not None else message)
+    
+    df['action'] = df['action'].astype(str).str.strip().str.lower()
+    for col in TEMPLATE_TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = normalize_text_column(df[col])
+    for col in TEMPLATE_LIST_COLUMNS:
+        if col in df.columns:
+            df[col] = normalize_text_column(df[col]).str.split('|').map(
+                lambda values: [v.strip() for v in values if v.strip()]
+            )
     
     # Required fields - more flexible
-    slug = safe_str_strip(row.get('slug', ''))
-    if not slug:
-        errors.append("Slug é obrigatório")
-    elif len(slug) < 2:
-        errors.append("Slug deve ter pelo menos 2 caracteres")
-    elif not re.match(r'^[a-z0-9-_]+$', slug):
-        errors.append(f"Slug inválido: {slug} (apenas letras minúsculas, números, hífens e underscores)")
-    
-    # Platform validation - more flexible
-    platform = safe_str_strip(row.get('platform', ''))
-    if not platform:
-        # Set default platform if not provided
-        row['platform'] = 'n8n'
-    
-    # URL validation - more relaxed
-    url_fields = ['tutorial_url', 'preview_image_url', 'download_url', 'json_url']
-    for field in url_fields:
-        url = row.get(field)
-        if url and not pd.isna(url) and url.strip():
-            url_str = str(url).strip()
-            # More flexible URL validation
-            if url_str and not (url_str.startswith('http://') or url_str.startswith('https://') or url_str.startswith('/')):
-                # Instead of error, auto-fix by adding https://
-                if '.' in url_str:  # Looks like a domain
-                    row[field] = f"https://{url_str}"
-                else:
-                    errors.append(f"{field} parece ser uma URL inválida: {url_str}")
+    slug = df['slug']
+    slug_length = slug.str.len()
+    flag(slug_length == 0, "Slug é obrigatório")
+    flag(slug_length == 1, "Slug deve ter pelo menos 2 caracteres")
+    flag((slug_length >= 2) & ~slug.str.fullmatch(r'[a-z0-9-_]+'),
+         "Slug inválido: {} (apenas letras minúsculas, números, hífens e underscores)", slug.to_numpy())
     
-    # Rating validation - more flexible
-    if 'rating_avg' in row and row['rating_avg'] is not None and not pd.isna(row['rating_avg']):
-        try:
-            rating = float(row['rating_avg'])
-            if rating < 0:
-                row['rating_avg'] = 0  # Auto-fix negative ratings
-            elif rating > 5:
-                row['rating_avg'] = 5  # Auto-fix ratings above 5
-        except (ValueError, TypeError):
-            # Remove invalid rating instead of error
-            row['rating_avg'] = None
-    
-    # Downloads validation - more flexible
-    if 'downloads_count' in row and row['downloads_count'] is not None and not pd.isna(row['downloads_count']):
-        try:
-            downloads = int(float(row['downloads_count']))  # Handle decimal numbers
-            if downloads < 0:
-                row['downloads_count'] = 0  # Auto-fix negative downloads
-        except (ValueError, TypeError):
-            # Set to 0 instead of error
-            row['downloads_count'] = 0
+    # Set default platform if not provided
+    df.loc[df['platform'] == '', 'platform'] = 'n8n'
+    
+    # URL validation - instead of error, auto-fix values that look like a domain
+    for field in TEMPLATE_URL_COLUMNS:
+        if field not in df.columns:
+            continue
+        url = df[field]
+        missing_scheme = (url != '') & ~url.str.startswith(('http://', 'https://', '/'))
+        looks_like_domain = missing_scheme & url.str.contains('.', regex=False)
+        df.loc[looks_like_domain, field] = 'https://' + url[looks_like_domain]
+        flag(missing_scheme & ~looks_like_domain, f"{field} parece ser uma URL inválida: {{}}", url.to_numpy())
     
-    return errors
+    # Rating: clamp to 0-5, drop values that are not numbers
+    if 'rating_avg' in df.columns:
+        df['rating_avg'] = pd.to_numeric(df['rating_avg'], errors='coerce').clip(0, 5)
+    
+    # Downloads: invalid values become 0, decimals are truncated, negatives become 0
+    if 'downloads_count' in df.columns:
+        raw = df['downloads_count']
+        downloads = pd.to_numeric(raw, errors='coerce')
+        downloads = downloads.mask(raw.notna() & downloads.isna(), 0)
+        df['downloads_count'] = np.trunc(downloads).clip(lower=0)
+    
+    return df, errors
 
 def convert_google_sheets_url(sheet_url: str) -> str:
     """Convert Google Sheets URL to CSV export URL"""
@@ -240,20 +437,110 @@ def convert_google_sheets_url(sheet_url: str) -> str:
     # Return CSV export URL
     return f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
 
-async def fetch_csv_from_url(url: str) -> str:
-    """Fetch CSV content from URL"""
-    try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        return response.text
-    except requests.exceptions.RequestException as e:
-        raise ValueError(f"Erro ao buscar CSV da URL: {str(e)}")
+class SheetFetcher:
+    """Async CSV downloader with a pooled HTTP client, a size cap and a per-URL cache.
+    
+    The last response of each URL is kept with its ETag/Last-Modified so the
+    next fetch is a conditional GET. Callers may attach the parsed result to
+    the returned entry under "parsed"; a 304 hands that same entry back, so an
+    unchanged sheet is neither downloaded nor parsed again. Pass a client (for
+    example one using httpx.MockTransport) to run against a local stand-in.
+    """
+    
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, max_bytes: int = SHEET_FETCH_MAX_BYTES, cache_size: int = SHEET_CACHE_SIZE):
+        self._client = client
+        self.max_bytes = max_bytes
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=30,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+            )
+        return self._client
+    
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        """Return the cache entry for url: {"content", "etag", "last_modified", "parsed", "not_modified"}"""
+        cached = self.cache.get(url)
+        headers = {}
+        if cached:
+            if cached["etag"]:
+                headers['If-None-Match'] = cached["etag"]
+            if cached["last_modified"]:
+                headers['If-Modified-Since'] = cached["last_modified"]
+        
+        try:
+            async with self.client.stream('GET', url, headers=headers) as response:
+                if response.status_code == 304 and cached:
+                    self.cache.move_to_end(url)
+                    cached["not_modified"] = True
+                    return cached
+                
+                response.raise_for_status()
+                
+                declared = int(response.headers.get('Content-Length') or 0)
+                if declared > self.max_bytes:
+                    raise ValueError(f"Planilha excede o tamanho máximo de {self.max_bytes // (1024 * 1024)} MB")
+                
+                body = bytearray()
+                async for data in response.aiter_bytes():
+                    body.extend(data)
+                    if len(body) > self.max_bytes:
+                        raise ValueError(f"Planilha excede o tamanho máximo de {self.max_bytes // (1024 * 1024)} MB")
+                
+                entry = {
+                    "content": bytes(body),
+                    "etag": response.headers.get('ETag'),
+                    "last_modified": response.headers.get('Last-Modified'),
+                    "parsed": None,
+                    "not_modified": False
+                }
+        except httpx.HTTPError as e:
+            raise ValueError(f"Erro ao buscar CSV da URL: {str(e)}")
+        
+        # Only responses that can be revalidated are worth caching
+        if entry["etag"] or entry["last_modified"]:
+            self.cache[url] = entry
+            self.cache.move_to_end(url)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.pop(url, None)
+        
+        return entry
+    
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+sheet_fetcher = SheetFetcher()
 
-async def preview_template_row(row: Dict[str, Any], action: str, line_number: int) -> PreviewRow:
-    """Preview a single template row without saving - RELAXED VALIDATION"""
+def parse_import_csv(source) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Parse a whole CSV file object, prepare its columns and validate it"""
+    df = pd.read_csv(source, encoding='utf-8', dtype=str)
+    prepare_import_columns(df)
+    return validate_template_frame(df)
+
+def preview_template_row(
+    row: Dict[str, Any],
+    action: str,
+    line_number: int,
+    validation_errors: List[str],
+    existing_hashes: Dict[str, Optional[str]]
+) -> PreviewRow:
+    """Preview a single row normalized by validate_template_frame without saving.
+    
+    ``existing_hashes`` (slug -> stored content_hash) is resolved once for the
+    whole file by the caller, so previewing a row costs no database round trip.
+    """
     
-    slug = safe_str_strip(row.get('slug', ''))
-    title = safe_str_strip(row.get('title', ''))
+    slug = row.get('slug', '')
+    title = row.get('title', '')
     
     # Use slug as title if title is empty
     if not title and slug:
@@ -276,8 +563,7 @@ async def preview_template_row(row: Dict[str, Any], action: str, line_number: in
         
         if action == "delete":
             # Check if template exists for deletion
-            existing = supabase.table('templates').select('*').eq('slug', slug).execute()
-            if existing.data:
+            if slug in existing_hashes:
                 preview_row.status = "delete"
                 preview_row.message = f"Template '{title or slug}' será deletado"
             else:
@@ -285,38 +571,24 @@ async def preview_template_row(row: Dict[str, Any], action: str, line_number: in
                 preview_row.message = f"Template com slug '{slug}' não encontrado para exclusão"
             return preview_row
         
-        # Validate data for upsert - but continue even with warnings
-        validation_errors = validate_template_data(row)
-        
-        # Check if template exists
-        existing = supabase.table('templates').select('*').eq('slug', slug).execute()
-        
         # Prepare preview data with all available fields
         preview_data = {
             "slug": slug,
             "title": title or f"Template {slug}",
-            "platform": safe_str_strip(row.get('platform', 'n8n')),
-            "author_name": safe_str_strip_or_none(row.get('author_name')) or 'Admin',
-            "description": safe_str_strip_or_none(row.get('description')) or '',
-            "categories": parse_pipe_separated(row.get('categories', '')),
-            "tools": parse_pipe_separated(row.get('tools', '')),
-            "status": safe_str_strip(row.get('status', 'published'))
+            "platform": row.get('platform') or 'n8n',
+            "author_name": row.get('author_name') or 'Admin',
+            "description": row.get('description') or '',
+            "categories": row.get('categories') or [],
+            "tools": row.get('tools') or [],
+            "status": row.get('status', 'published')
         }
         
-        # Add rating and downloads if present - with auto-correction
-        if 'rating_avg' in row and row['rating_avg'] is not None and not pd.isna(row['rating_avg']):
-            try:
-                rating = float(row['rating_avg'])
-                preview_data["rating_avg"] = max(0, min(5, rating))  # Clamp between 0-5
-            except:
-                preview_data["rating_avg"] = None
+        # Rating and downloads were already clamped by validate_template_frame
+        if not pd.isna(row.get('rating_avg')):
+            preview_data["rating_avg"] = row['rating_avg']
         
-        if 'downloads_count' in row and row['downloads_count'] is not None and not pd.isna(row['downloads_count']):
-            try:
-                downloads = int(float(row['downloads_count']))
-                preview_data["downloads_count"] = max(0, downloads)  # Ensure non-negative
-            except:
-                preview_data["downloads_count"] = 0
+        if not pd.isna(row.get('downloads_count')):
+            preview_data["downloads_count"] = int(row['downloads_count'])
         
         preview_row.data = preview_data
         
@@ -324,7 +596,10 @@ async def preview_template_row(row: Dict[str, Any], action: str, line_number: in
         if validation_errors:
             preview_row.status = "error"
             preview_row.message = "; ".join(validation_errors)
-        elif existing.data:
+        elif slug in existing_hashes and existing_hashes[slug] == build_template_data(row, slug)["content_hash"]:
+            preview_row.status = "unchanged"
+            preview_row.message = f"Template '{title}' sem alterações"
+        elif slug in existing_hashes:
             preview_row.status = "update"
             preview_row.message = f"Template '{title}' será atualizado"
         else:
@@ -338,84 +613,319 @@ async def preview_template_row(row: Dict[str, Any], action: str, line_number: in
         preview_row.message = f"Erro ao processar linha: {str(e)}"
         return preview_row
 
-async def process_template_row(row: Dict[str, Any], action: str) -> Dict[str, Any]:
-    """Process a single template row"""
-    result = {"success": False, "action": action, "errors": []}
+def build_template_data(row: Dict[str, Any], slug: str) -> Dict[str, Any]:
+    """Build the templates table payload for a row normalized by validate_template_frame"""
+    template_data = {
+        "slug": slug,
+        "title": row.get('title', ''),
+        "description": row.get('description') or None,
+        "platform": row.get('platform', ''),
+        "author_name": row.get('author_name') or None,
+        "author_email": row.get('author_email') or None,
+        "tutorial_url": row.get('tutorial_url') or None,
+        "preview_image_url": row.get('preview_image_url') or None,
+        "download_url": row.get('download_url') or None,
+        "json_url": row.get('json_url') or None,
+        "language": row.get('language') or 'pt-BR',
+        "status": row.get('status') or 'draft',
+        "tags": row.get('tags') or None,
+        "notes": row.get('notes') or None,
+        "external_id": row.get('external_id') or None,
+        "categories": row.get('categories') or [],
+        "tools": row.get('tools') or [],
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+    
+    # Handle numeric fields
+    if not pd.isna(row.get('rating_avg')):
+        template_data["rating_avg"] = float(row['rating_avg'])
+    
+    if not pd.isna(row.get('downloads_count')):
+        template_data["downloads_count"] = int(row['downloads_count'])
+    
+    template_data["content_hash"] = template_content_hash(template_data)
+    return template_data
+
+def template_content_hash(template_data: Dict[str, Any]) -> str:
+    """Hash the importable fields of a template payload (timestamps and ids excluded)"""
+    content = {k: v for k, v in template_data.items() if k not in CONTENT_HASH_EXCLUDED_FIELDS}
+    encoded = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+def fetch_edited_slugs() -> set:
+    """Slugs of templates without a content_hash: edited since their last import, or never imported"""
+    result = supabase.table('templates').select('slug').is_('content_hash', 'null').execute()
+    return {item['slug'] for item in result.data or []}
+
+def fetch_existing_hashes(slugs: List[str]) -> Dict[str, Optional[str]]:
+    """Map each slug that already exists to its stored content_hash, one query per batch"""
+    existing = {}
+    unique_slugs = list(dict.fromkeys(slugs))
+    for start in range(0, len(unique_slugs), SLUG_LOOKUP_BATCH_SIZE):
+        batch = unique_slugs[start:start + SLUG_LOOKUP_BATCH_SIZE]
+        result = supabase.table('templates').select('slug, content_hash').in_('slug', batch).execute()
+        existing.update((item['slug'], item.get('content_hash')) for item in result.data)
+    return existing
+
+def write_template_upserts(pending: Dict[str, Dict[str, Any]], report: ImportReport) -> None:
+    """Upsert pending templates keyed on slug and credit their outcomes to the report.
+    
+    PostgREST requires every object of a bulk upsert to carry the same keys, so
+    payloads are grouped by column set. If a bulk write fails, the group is
+    retried row by row so a single bad row does not discard the whole chunk.
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for entry in pending.values():
+        groups.setdefault(tuple(sorted(entry["data"])), []).append(entry)
+    
+    for entries in groups.values():
+        try:
+            supabase.table('templates').upsert(
+                [entry["data"] for entry in entries], on_conflict='slug'
+            ).execute()
+            written = entries
+        except Exception as e:
+            logger.warning(f"Bulk upsert failed, retrying row by row: {str(e)}")
+            written = []
+            for entry in entries:
+                try:
+                    supabase.table('templates').upsert(entry["data"], on_conflict='slug').execute()
+                    written.append(entry)
+                except Exception as row_error:
+                    for line_number, _ in entry["outcomes"]:
+                        report.errors.append(f"Linha {line_number}: Erro ao processar linha: {str(row_error)}")
+        
+        for entry in written:
+            for _, outcome in entry["outcomes"]:
+                setattr(report, outcome, getattr(report, outcome) + 1)
+        if written:
+            bump_catalog_version()
+
+def write_template_deletes(pending: Dict[str, List[tuple]], report: ImportReport) -> None:
+    """Delete pending slugs in one statement and credit their outcomes to the report"""
+    if not pending:
+        return
     
     try:
-        slug = safe_str_strip(row.get('slug', ''))
-        if not slug:
-            result["errors"].append("Slug é obrigatório")
-            return result
-        
-        if action == "delete":
-            # Delete template by slug
-            delete_result = supabase.table('templates').delete().eq('slug', slug).execute()
-            if delete_result.data:
-                result["success"] = True
-                result["action"] = "deleted"
+        supabase.table('templates').delete().in_('slug', list(pending)).execute()
+    except Exception as e:
+        for outcomes in pending.values():
+            for line_number, _ in outcomes:
+                report.errors.append(f"Linha {line_number}: Erro ao processar linha: {str(e)}")
+        return
+    
+    bump_catalog_version()
+    for outcomes in pending.values():
+        for _, outcome in outcomes:
+            setattr(report, outcome, getattr(report, outcome) + 1)
+
+def process_template_chunk(rows: List[tuple], report: ImportReport) -> None:
+    """Apply a chunk of (line_number, row, action) tuples with set-based writes.
+    
+    Rows must already be normalized and validated by validate_template_frame.
+    Existing slugs are resolved with a single lookup, then rows are replayed in
+    file order against that snapshot so repeated slugs inside the chunk keep
+    the same inserted/updated/deleted semantics as a row-by-row import. Deletes
+    are written before upserts, which matches any delete-then-reinsert sequence.
+    Upserts whose content_hash matches the stored one are counted as unchanged
+    and not written at all.
+    """
+    slugs = [row.get('slug', '') for _, row, _ in rows]
+    hashes = fetch_existing_hashes([slug for slug in slugs if slug])
+    known = set(hashes)
+    
+    pending_upserts: Dict[str, Dict[str, Any]] = {}
+    pending_deletes: Dict[str, List[tuple]] = {}
+    
+    for (line_number, row, action), slug in zip(rows, slugs):
+        try:
+            if not slug:
+                report.errors.append(f"Linha {line_number}: Slug é obrigatório")
+                continue
+            
+            if action == "delete":
+                if slug not in known:
+                    report.errors.append(f"Linha {line_number}: Template com slug '{slug}' não encontrado para exclusão")
+                    continue
+                known.discard(slug)
+                hashes.pop(slug, None)
+                # An earlier upsert of this slug is superseded by the delete
+                superseded = pending_upserts.pop(slug, None)
+                outcomes = pending_deletes.setdefault(slug, [])
+                if superseded:
+                    outcomes.extend(superseded["outcomes"])
+                outcomes.append((line_number, "deleted"))
+                continue
+            
+            template_data = build_template_data(row, slug)
+            if slug in known and hashes.get(slug) == template_data["content_hash"]:
+                report.unchanged += 1
+                continue
+            
+            hashes[slug] = template_data["content_hash"]
+            entry = pending_upserts.get(slug)
+            
+            if slug in known:
+                outcome = "updated"
             else:
-                result["errors"].append(f"Template com slug '{slug}' não encontrado para exclusão")
-            return result
-        
-        # Validate data for upsert
-        validation_errors = validate_template_data(row)
-        if validation_errors:
-            result["errors"] = validation_errors
-            return result
-        
-        # Prepare template data
-        template_data = {
-            "slug": slug,
-            "title": safe_str_strip(row.get('title', '')),
-            "description": safe_str_strip_or_none(row.get('description')),
-            "platform": safe_str_strip(row.get('platform', '')),
-            "author_name": safe_str_strip_or_none(row.get('author_name')),
-            "author_email": safe_str_strip_or_none(row.get('author_email')),
-            "tutorial_url": safe_str_strip_or_none(row.get('tutorial_url')),
-            "preview_image_url": safe_str_strip_or_none(row.get('preview_image_url')),
-            "download_url": safe_str_strip_or_none(row.get('download_url')),
-            "json_url": safe_str_strip_or_none(row.get('json_url')),
-            "language": safe_str_strip(row.get('language', 'pt-BR')) or 'pt-BR',
-            "status": safe_str_strip(row.get('status', 'draft')) or 'draft',
-            "tags": safe_str_strip_or_none(row.get('tags')),
-            "notes": safe_str_strip_or_none(row.get('notes')),
-            "external_id": safe_str_strip_or_none(row.get('external_id')),
-            "categories": parse_pipe_separated(row.get('categories', '')),
-            "tools": parse_pipe_separated(row.get('tools', '')),
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }
-        
-        # Handle numeric fields
-        if 'rating_avg' in row and row['rating_avg'] is not None and not pd.isna(row['rating_avg']):
-            template_data["rating_avg"] = float(row['rating_avg'])
-        
-        if 'downloads_count' in row and row['downloads_count'] is not None and not pd.isna(row['downloads_count']):
-            template_data["downloads_count"] = int(row['downloads_count'])
-        
-        # Check if template exists
-        existing = supabase.table('templates').select('*').eq('slug', slug).execute()
-        
-        if existing.data:
-            # Update existing template
-            update_result = supabase.table('templates').update(template_data).eq('slug', slug).execute()
-            result["success"] = True
-            result["action"] = "updated"
-        else:
-            # Insert new template
-            template_data["id"] = str(uuid.uuid4())
-            template_data["created_at"] = datetime.now(timezone.utc).isoformat()
-            template_data.setdefault("downloads_count", 0)
+                outcome = "inserted"
+                template_data["id"] = str(uuid.uuid4())
+                template_data["created_at"] = datetime.now(timezone.utc).isoformat()
+                template_data.setdefault("downloads_count", 0)
+                known.add(slug)
             
-            insert_result = supabase.table('templates').insert(template_data).execute()
-            result["success"] = True
-            result["action"] = "inserted"
+            if entry:
+                entry["data"].update(template_data)
+                entry["outcomes"].append((line_number, outcome))
+            else:
+                pending_upserts[slug] = {"data": template_data, "outcomes": [(line_number, outcome)]}
+                
+        except Exception as e:
+            report.errors.append(f"Linha {line_number}: Erro ao processar linha: {str(e)}")
+    
+    write_template_deletes(pending_deletes, report)
+    if pending_upserts:
+        write_template_upserts(pending_upserts, report)
+
+facet_cache: Dict[str, Any] = {"version": None, "expires": 0.0, "facets": None}
+
+def get_cached_template_facets() -> TemplateFacets:
+    """Return facets from memory, recomputing them only after a catalog write or TTL expiry"""
+    version = catalog_version
+    if facet_cache["version"] == version and facet_cache["expires"] > time.monotonic():
+        return facet_cache["facets"]
+    
+    facets = get_template_facets()
+    # Failed lookups come back empty; don't pin them for a whole TTL
+    if facets.platforms or facets.categories or facets.tools:
+        facet_cache.update(version=version, expires=time.monotonic() + CATALOG_CACHE_TTL_SECONDS, facets=facets)
+    return facets
+
+async def load_listing_facets(include_facets: bool) -> TemplateFacets:
+    """Facet names for the listing response, or empty lists when the client opted out"""
+    if not include_facets:
+        return TemplateFacets(platforms=[], categories=[], tools=[])
+    return await asyncio.to_thread(get_cached_template_facets)
+
+# Search-as-you-type: prefixes up to this length have their top suggestions
+# precomputed at build time, longer ones are answered by binary search
+SUGGEST_PRECOMPUTED_PREFIX_LENGTH = 2
+SUGGEST_MAX_LIMIT = 20
+
+def normalize_suggest_key(text: str) -> str:
+    """Lowercase and strip accents so 'Automação' matches 'automacao'"""
+    folded = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in folded if not unicodedata.combining(c)).lower().strip()
+
+class SuggestIndex:
+    """Immutable sorted-array prefix index over titles, tags, tools and categories"""
+    
+    def __init__(self, templates: List[Dict[str, Any]]):
+        # (kind, value) -> [weight, slug]; titles weigh by downloads, the
+        # other kinds by how many published templates carry them
+        entries: Dict[Tuple[str, str], List[Any]] = {}
+        
+        def add(kind: str, value: Optional[str], weight: int, slug: Optional[str] = None):
+            value = (value or '').strip()
+            if not value:
+                return
+            entry = entries.setdefault((kind, value), [0, slug])
+            entry[0] += weight
         
-        return result
+        for template in templates:
+            add('title', template.get('title'), template.get('downloads_count') or 0, template.get('slug'))
+            for tag in re.split(r'[,;]', template.get('tags') or ''):
+                add('tag', tag, 1)
+            for tool in template.get('tools') or []:
+                add('tool', tool, 1)
+            for category in template.get('categories') or []:
+                add('category', category, 1)
+        
+        # Rank order: heavier first, then alphabetical for stable output
+        ranked = sorted(entries.items(), key=lambda item: (-item[1][0], item[0][1].lower(), item[0][0]))
+        self.suggestions = [
+            Suggestion(kind=kind, value=value, slug=slug) for (kind, value), (_, slug) in ranked
+        ]
+        
+        # Every word start of a value is a key, so "email" finds "Enviar email".
+        # Keys point at rank positions, which makes "best first" a plain sort
+        pairs = set()
+        for rank, suggestion in enumerate(self.suggestions):
+            key = normalize_suggest_key(suggestion.value)
+            for match in re.finditer(r'\w+', key):
+                pairs.add((key[match.start():], rank))
+        pairs = sorted(pairs)
+        self.keys = [key for key, _ in pairs]
+        self.ranks = [rank for _, rank in pairs]
+        
+        self.short_prefixes: Dict[str, List[int]] = {}
+        for length in range(1, SUGGEST_PRECOMPUTED_PREFIX_LENGTH + 1):
+            for prefix in {key[:length] for key in self.keys if len(key) >= length}:
+                self.short_prefixes[prefix] = self._scan(prefix)
+    
+    def _scan(self, prefix: str) -> List[int]:
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + '\uffff')
+        return sorted(set(self.ranks[lo:hi]))[:SUGGEST_MAX_LIMIT]
+    
+    def lookup(self, prefix: str, limit: int) -> List[Suggestion]:
+        key = normalize_suggest_key(prefix)
+        if not key:
+            return []
+        ranks = self.short_prefixes.get(key, []) if len(key) <= SUGGEST_PRECOMPUTED_PREFIX_LENGTH else self._scan(key)
+        return [self.suggestions[rank] for rank in ranks[:limit]]
+
+suggest_state: Dict[str, Any] = {"version": None, "expires": 0.0, "index": None, "task": None}
+
+def load_suggest_index() -> SuggestIndex:
+    """Read the published catalog and build a fresh prefix index (runs in a worker thread)"""
+    result = supabase.table('templates').select(
+        'slug, title, tags, tools, categories, downloads_count'
+    ).eq('status', 'published').execute()
+    return SuggestIndex(result.data or [])
+
+async def rebuild_suggest_index():
+    version = catalog_version
+    try:
+        index = await asyncio.to_thread(load_suggest_index)
+        suggest_state.update(index=index, version=version, expires=time.monotonic() + CATALOG_CACHE_TTL_SECONDS)
+    except Exception as e:
+        logger.error(f"Error building suggest index: {str(e)}")
+
+async def get_suggest_index() -> Optional[SuggestIndex]:
+    """Current prefix index; a stale one keeps serving while a rebuild runs in the background"""
+    fresh = suggest_state["version"] == catalog_version and suggest_state["expires"] > time.monotonic()
+    task = suggest_state["task"]
+    if not fresh and (task is None or task.done()):
+        task = suggest_state["task"] = asyncio.create_task(rebuild_suggest_index())
+    if suggest_state["index"] is None and task is not None:
+        # Nothing to serve yet, so the very first request waits for the build
+        await asyncio.shield(task)
+    return suggest_state["index"]
+
+def get_template_facet_counts(
+    search: Optional[str] = None,
+    platform: Optional[str] = None,
+    category: Optional[str] = None,
+    tool: Optional[str] = None
+) -> TemplateFacetCounts:
+    """Get value -> count facets under the given filters, aggregated in the database"""
+    try:
+        result = supabase.rpc('get_template_facet_counts', {
+            'p_search': (search or '').strip() or None,
+            'p_platform': platform or None,
+            'p_category': category or None,
+            'p_tool': tool or None
+        }).execute()
         
+        counts = TemplateFacetCounts()
+        groups = {'platform': counts.platforms, 'category': counts.categories, 'tool': counts.tools}
+        for item in result.data or []:
+            groups[item['facet']].append(FacetCount(value=item['value'], count=item['count']))
+        return counts
     except Exception as e:
-        result["errors"].append(f"Erro ao processar linha: {str(e)}")
-        return result
+        logger.error(f"Error getting facet counts: {str(e)}")
+        return TemplateFacetCounts()
 
 def get_template_facets() -> TemplateFacets:
     """Get available facets for filtering"""
@@ -448,6 +958,9 @@ def get_template_facets() -> TemplateFacets:
         logger.error(f"Error getting facets: {str(e)}")
         return TemplateFacets(platforms=[], categories=[], tools=[])
 
+# Text search configuration created by search_schema.sql (Portuguese stemming + unaccent)
+SEARCH_TEXT_CONFIG = 'portuguese_unaccent'
+
 def get_templates_with_filters(
     search: Optional[str] = None,
     platform: Optional[str] = None,
@@ -460,7 +973,7 @@ def get_templates_with_filters(
     
     try:
         # Start with base query
-        query = supabase.table('templates').select('*', count='exact').eq('status', 'published')
+        query = supabase.table('templates').select(TEMPLATE_SELECT_COLUMNS, count='exact').eq('status', 'published')
         
         # Add platform filter
         if platform:
@@ -474,12 +987,9 @@ def get_templates_with_filters(
         if tool:
             query = query.contains('tools', [tool])
         
-        # Enhanced search functionality
-        if search:
-            search_term = search.lower().strip()
-            # Use text search on multiple fields with case-insensitive matching
-            search_query = f"title.ilike.*{search_term}*,description.ilike.*{search_term}*,tags.ilike.*{search_term}*,author_name.ilike.*{search_term}*,platform.ilike.*{search_term}*"
-            query = query.or_(search_query)
+        # Full-text search on the indexed search_vector column
+        if search and search.strip():
+            query = query.filter('search_vector', f'wfts({SEARCH_TEXT_CONFIG})', search.strip())
         
         # Get total count first
         count_result = query.execute()
@@ -500,7 +1010,7 @@ def get_templates_with_filters(
                 template['created_at'] = datetime.fromisoformat(template['created_at'].replace('Z', '+00:00'))
             if isinstance(template.get('updated_at'), str):
                 template['updated_at'] = datetime.fromisoformat(template['updated_at'].replace('Z', '+00:00'))
-            template_items.append(Template(**template))
+            template_items.append(TemplateWithUserData(**template))
         
         # Calculate pagination
         total_pages = (total + page_size - 1) // page_size
@@ -532,91 +1042,841 @@ def get_templates_with_filters(
             facets={"platforms": [], "categories": [], "tools": []}
         )
 
-# API Endpoints
-@api_router.post("/import/templates", response_model=ImportReport)
-async def import_templates(file: UploadFile = File(...)):
-    """Import templates from CSV file"""
+def prepare_import_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Check required import columns and fill in optional ones with defaults (in place)"""
+    # Validate required columns - MORE FLEXIBLE
+    required_columns = ['action']  # Only action is truly required
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Coluna obrigatória ausente: {', '.join(missing_columns)}"
+        )
+        
+    # Auto-add missing common columns with defaults
+    if 'slug' not in df.columns and 'key' not in df.columns:
+        raise HTTPException(
+            status_code=400,
+            detail="É necessário ter pelo menos uma coluna 'slug' ou 'key' para identificar os registros"
+        )
+        
+    # If we have 'key' but not 'slug', use 'key' as 'slug'
+    if 'key' in df.columns and 'slug' not in df.columns:
+        df['slug'] = df['key']
+        
+    # Auto-add missing optional columns with defaults
+    optional_defaults = {
+        'title': 'Título não informado',
+        'platform': 'n8n',
+        'status': 'published',
+        'description': '',
+        'author_name': 'Admin',
+        'categories': '',
+        'tools': '',
+        'rating_avg': '',
+        'downloads_count': '0'
+    }
+        
+    for col, default_value in optional_defaults.items():
+        if col not in df.columns:
+            df[col] = default_value
+
+    return df
+
+def read_csv_chunks(source, chunk_size: int = None):
+    """Parse a CSV file object incrementally, yielding prepared DataFrame chunks.
     
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Arquivo deve ser um CSV")
+    pandas keeps a running RangeIndex across chunks, so ``index + 2`` is still
+    the CSV line number of a row regardless of which chunk it came from. Every
+    column is read as text: dtype inference would run per chunk, so a value's
+    type (and its content_hash) would depend on where the chunk boundaries fall.
+    validate_template_frame converts the numeric columns itself.
+    """
+    reader = pd.read_csv(source, chunksize=chunk_size or IMPORT_CHUNK_SIZE, encoding='utf-8', dtype=str)
+    for df in reader:
+        yield prepare_import_columns(df)
+
+def describe_csv_read_error(error: Exception, line_number: int) -> str:
+    """Report line for a CSV that stopped parsing partway; line_number is the first unread line"""
+    if isinstance(error, UnicodeDecodeError):
+        return f"Linha {line_number}: Erro de codificação. Arquivo deve estar em UTF-8"
+    # The C parser names the offending line ("Expected 5 fields in line 603, saw 6")
+    match = re.search(r'line (\d+)', str(error))
+    return f"Linha {match.group(1) if match else line_number}: Erro ao fazer parse do CSV: {str(error)}"
+
+def run_template_import(source, report: ImportReport, on_chunk=None, atomic: bool = False) -> ImportReport:
+    """Stream a CSV file object through the import engine.
     
-    report = ImportReport()
+    Blocking: callers on the event loop should run it via asyncio.to_thread
+    while holding import_write_lock. ``on_chunk`` is called with the number of
+    rows in each chunk once that chunk has been written (or staged). With
+    ``atomic`` the chunks are staged and applied at the end by a single
+    merge_template_import call, so the import is all-or-nothing.
     
+    A CSV that stops parsing in the first chunk raises; later on, the rows
+    already written stay and the report gets a "Linha N:" error instead.
+    """
+    import_id = str(uuid.uuid4()) if atomic else None
     try:
-        # Read CSV content
-        content = await file.read()
-        csv_content = content.decode('utf-8')
-        
-        # Parse CSV
-        df = pd.read_csv(StringIO(csv_content))
-        
-        # Validate required columns - MORE FLEXIBLE
-        required_columns = ['action']  # Only action is truly required
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Coluna obrigatória ausente: {', '.join(missing_columns)}"
-            )
-        
-        # Auto-add missing common columns with defaults
-        if 'slug' not in df.columns and 'key' not in df.columns:
-            raise HTTPException(
-                status_code=400,
-                detail="É necessário ter pelo menos uma coluna 'slug' ou 'key' para identificar os registros"
-            )
+        chunks = read_csv_chunks(source)
+        next_line = 2
+        while True:
+            try:
+                df = next(chunks)
+            except StopIteration:
+                break
+            except (pd.errors.ParserError, UnicodeDecodeError) as e:
+                if next_line == 2:
+                    raise  # nothing written yet: reject the whole file
+                # Earlier chunks are already written; report them instead of hiding them
+                report.errors.append(describe_csv_read_error(e, next_line))
+                report.errors.append("Importação interrompida: as linhas seguintes não foram processadas")
+                break
+            next_line = int(df.index[-1]) + 3
+            
+            df, validation_errors = validate_template_frame(df)
+            apply_validated_frame(df, validation_errors, report, import_id)
+            if on_chunk:
+                on_chunk(len(df))
+        
+        if import_id:
+            merge_staged_import(import_id, report)
+    finally:
+        if import_id:
+            discard_staged_import(import_id)
+    
+    return report
+
+def iter_valid_rows(df: pd.DataFrame, validation_errors: np.ndarray, report: ImportReport):
+    """Yield (line_number, row, action) for the valid rows of a chunk, reporting the others"""
+    for position, (index, row) in enumerate(zip(df.index, df.to_dict('records'))):
+        action = row['action']
         
-        # If we have 'key' but not 'slug', use 'key' as 'slug'
-        if 'key' in df.columns and 'slug' not in df.columns:
-            df['slug'] = df['key']
-        
-        # Auto-add missing optional columns with defaults
-        optional_defaults = {
-            'title': 'Título não informado',
-            'platform': 'n8n',
-            'status': 'published',
-            'description': '',
-            'author_name': 'Admin',
-            'categories': '',
-            'tools': '',
-            'rating_avg': '',
-            'downloads_count': '0'
-        }
+        if action not in ['upsert', 'delete']:
+            report.errors.append(f"Linha {index + 2}: Ação inválida '{action}' (deve ser 'upsert' ou 'delete')")
+            continue
         
-        for col, default_value in optional_defaults.items():
-            if col not in df.columns:
-                df[col] = default_value
+        if action == 'upsert' and validation_errors[position]:
+            for error in validation_errors[position]:
+                report.errors.append(f"Linha {index + 2}: {error}")
+            continue
         
-        # Process each row
-        for index, row in df.iterrows():
+        yield index + 2, row, action
+
+def apply_validated_frame(df: pd.DataFrame, validation_errors: np.ndarray, report: ImportReport, import_id: Optional[str] = None) -> None:
+    """Write a chunk normalized by validate_template_frame, or stage it when import_id is set"""
+    chunk = list(iter_valid_rows(df, validation_errors, report))
+    if not chunk:
+        return
+    
+    if import_id:
+        stage_template_rows(import_id, chunk, report)
+    else:
+        process_template_chunk(chunk, report)
+
+def stage_template_rows(import_id: str, rows: List[tuple], report: ImportReport) -> None:
+    """Copy a chunk of valid rows into template_import_staging with one insert"""
+    staged = []
+    for line_number, row, action in rows:
+        slug = row.get('slug', '')
+        if not slug:
+            report.errors.append(f"Linha {line_number}: Slug é obrigatório")
+            continue
+        staged.append({
+            "import_id": import_id,
+            "line_number": line_number,
+            "action": action,
+            "slug": slug,
+            "data": build_template_data(row, slug) if action == "upsert" else {}
+        })
+    
+    if staged:
+        supabase.table('template_import_staging').insert(staged).execute()
+
+def merge_staged_import(import_id: str, report: ImportReport) -> None:
+    """Apply a staged import in one transaction and map the per-row outcomes into the report.
+    
+    Nothing is merged if any row was already rejected while staging, and the
+    merge function itself applies nothing when it finds an invalid row.
+    """
+    if report.errors:
+        report.errors.append("Importação cancelada: nenhuma alteração aplicada (modo atômico)")
+        return
+    
+    result = supabase.rpc('merge_template_import', {'p_import_id': import_id}).execute()
+    bump_catalog_version()
+    
+    for item in result.data or []:
+        if item['outcome'] == 'error':
+            report.errors.append(f"Linha {item['line_number']}: {item['message']}")
+        elif item['outcome'] in ('inserted', 'updated', 'unchanged', 'deleted'):
+            setattr(report, item['outcome'], getattr(report, item['outcome']) + 1)
+    
+    if report.errors:
+        report.errors.append("Importação cancelada: nenhuma alteração aplicada (modo atômico)")
+
+def discard_staged_import(import_id: str) -> None:
+    """Remove whatever is left of a staged import (the merge function clears its own rows)"""
+    try:
+        supabase.table('template_import_staging').delete().eq('import_id', import_id).execute()
+    except Exception as e:
+        logger.warning(f"Could not clean staged import {import_id}: {str(e)}")
+
+# Validated previews kept server-side so /api/import/commit can apply them
+# without re-fetching or re-parsing. Bounded by a TTL and a total memory cap;
+# this is per worker process, so a commit must reach the worker that ran the preview.
+preview_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+def store_preview(df: pd.DataFrame, validation_errors: np.ndarray) -> Optional[Tuple[str, datetime]]:
+    """Keep a validated preview and return (token, expires_at), or None if it does not fit"""
+    now = time.monotonic()
+    for token in [t for t, entry in preview_cache.items() if entry["expires"] <= now]:
+        del preview_cache[token]
+    
+    size = int(df.memory_usage(deep=True).sum())
+    if size > PREVIEW_CACHE_MAX_BYTES:
+        return None
+    
+    # Evict the oldest previews until the new one fits
+    while preview_cache and sum(entry["size"] for entry in preview_cache.values()) + size > PREVIEW_CACHE_MAX_BYTES:
+        preview_cache.popitem(last=False)
+    
+    token = secrets.token_urlsafe(24)
+    preview_cache[token] = {
+        "df": df,
+        "errors": validation_errors,
+        "expires": now + PREVIEW_TOKEN_TTL_SECONDS,
+        "size": size
+    }
+    return token, datetime.now(timezone.utc) + timedelta(seconds=PREVIEW_TOKEN_TTL_SECONDS)
+
+def take_preview(token: str) -> Optional[Dict[str, Any]]:
+    """Remove and return a stored preview; tokens are single use"""
+    entry = preview_cache.pop(token, None)
+    if entry and entry["expires"] > time.monotonic():
+        return entry
+    return None
+
+def apply_preview(entry: Dict[str, Any], report: ImportReport, atomic: bool = False) -> ImportReport:
+    """Write a stored preview through the import engine, chunk by chunk"""
+    df, validation_errors = entry["df"], entry["errors"]
+    import_id = str(uuid.uuid4()) if atomic else None
+    try:
+        for start in range(0, len(df), IMPORT_CHUNK_SIZE):
+            end = start + IMPORT_CHUNK_SIZE
+            apply_validated_frame(df.iloc[start:end], validation_errors[start:end], report, import_id)
+        
+        if import_id:
+            merge_staged_import(import_id, report)
+    finally:
+        if import_id:
+            discard_staged_import(import_id)
+    
+    return report
+
+class WriteLease:
+    """Async lock shared by every worker process, backed by a write_leases row
+    
+    Waiters in the same process queue on an asyncio.Lock; the one in front
+    polls try_acquire_write_lease until the lease is free. While held, the
+    lease is renewed every third of its TTL, so it only expires when the
+    holding worker dies.
+    """
+    
+    def __init__(self, name: str, ttl_seconds: int = WRITE_LEASE_TTL_SECONDS):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.holder = f"{socket.gethostname()}-{os.getpid()}-{secrets.token_hex(3)}"
+        self.local = asyncio.Lock()
+        self.renew_task: Optional[asyncio.Task] = None
+    
+    def try_acquire(self) -> bool:
+        """Take or renew the lease without waiting (blocking call)"""
+        result = supabase.rpc('try_acquire_write_lease', {
+            'p_name': self.name,
+            'p_holder': self.holder,
+            'p_ttl_seconds': self.ttl_seconds
+        }).execute()
+        return result.data is True
+    
+    async def _renew(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl_seconds / 3)
             try:
-                action = str(row.get('action', '')).strip().lower()
-                
-                if action not in ['upsert', 'delete']:
-                    report.errors.append(f"Linha {index + 2}: Ação inválida '{action}' (deve ser 'upsert' ou 'delete')")
-                    continue
-                
-                # Process the row
-                result = await process_template_row(row.to_dict(), action)
+                if not await asyncio.to_thread(self.try_acquire):
+                    logger.error(f"Write lease {self.name} was lost while held")
+            except Exception as e:
+                logger.error(f"Error renewing write lease {self.name}: {str(e)}")
+    
+    async def __aenter__(self) -> "WriteLease":
+        await self.local.acquire()
+        try:
+            while not await asyncio.to_thread(self.try_acquire):
+                await asyncio.sleep(WRITE_LEASE_POLL_SECONDS)
+        except BaseException:
+            self.local.release()
+            raise
+        self.renew_task = asyncio.create_task(self._renew())
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        self.renew_task.cancel()
+        try:
+            await asyncio.to_thread(
+                supabase.rpc('release_write_lease', {'p_name': self.name, 'p_holder': self.holder}).execute
+            )
+        except Exception as e:
+            # It expires on its own after ttl_seconds
+            logger.warning(f"Could not release write lease {self.name}: {str(e)}")
+        finally:
+            self.local.release()
+
+# Background import jobs. Only one import writes at a time across all workers;
+# queued jobs wait on the lease. Job status is kept in the import_jobs table so
+# any worker can answer for it; import_jobs holds the jobs this worker runs.
+import_write_lock = WriteLease('template_import')
+import_jobs: Dict[str, ImportJob] = {}
+
+def save_import_job(job: ImportJob) -> None:
+    """Write a job's current status and progress to the import_jobs table (blocking call)"""
+    try:
+        supabase.table('import_jobs').upsert({
+            'id': job.id,
+            'status': job.status,
+            'job': job.model_dump(mode='json'),
+            'updated_at': datetime.now(timezone.utc).isoformat()
+        }).execute()
+    except Exception as e:
+        logger.warning(f"Could not save import job {job.id}: {str(e)}")
+
+def load_import_job(job_id: str) -> Optional[ImportJob]:
+    """A job from the import_jobs table, whichever worker ran it"""
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return None
+    result = supabase.table('import_jobs').select('job').eq('id', job_id).execute()
+    return ImportJob.model_validate(result.data[0]['job']) if result.data else None
+
+def register_import_job(job: ImportJob) -> None:
+    """Track a new job, evicting the oldest finished jobs beyond IMPORT_JOB_HISTORY"""
+    import_jobs[job.id] = job
+    finished = [j for j in import_jobs.values() if j.status in ("completed", "failed")]
+    for old_job in sorted(finished, key=lambda j: j.created_at)[:max(0, len(finished) - IMPORT_JOB_HISTORY)]:
+        import_jobs.pop(old_job.id, None)
+    
+    save_import_job(job)
+    try:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=IMPORT_JOB_RETENTION_DAYS)
+        supabase.table('import_jobs').delete().lt('created_at', cutoff.isoformat()).execute()
+    except Exception as e:
+        logger.warning(f"Could not purge old import jobs: {str(e)}")
+
+async def run_import_job(job: ImportJob, path: str) -> None:
+    """Run a queued import job from its spooled temp file"""
+    try:
+        async with import_write_lock:
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc)
+            started = time.monotonic()
+            await asyncio.to_thread(save_import_job, job)
+            
+            with open(path, 'rb') as source:
+                def on_chunk(rows: int) -> None:
+                    job.rows_processed += rows
+                    job.bytes_processed = min(source.tell(), job.total_bytes)
+                    elapsed = time.monotonic() - started
+                    if elapsed > 0:
+                        job.rows_per_second = round(job.rows_processed / elapsed, 1)
+                    if job.total_bytes and job.bytes_processed:
+                        fraction = job.bytes_processed / job.total_bytes
+                        job.eta_seconds = round(elapsed * (1 - fraction) / fraction, 1)
+                    save_import_job(job)
                 
-                if result["success"]:
-                    if result["action"] == "inserted":
-                        report.inserted += 1
-                    elif result["action"] == "updated":
-                        report.updated += 1
-                    elif result["action"] == "deleted":
-                        report.deleted += 1
-                else:
-                    for error in result["errors"]:
-                        report.errors.append(f"Linha {index + 2}: {error}")
-                        
+                await asyncio.to_thread(run_template_import, source, job.report, on_chunk, job.atomic)
+            
+            job.status = "completed"
+            job.bytes_processed = job.total_bytes
+            job.eta_seconds = 0
+            logger.info(f"Import job {job.id} completed: {job.report.inserted} inserted, {job.report.updated} updated, {job.report.unchanged} unchanged, {job.report.deleted} deleted, {len(job.report.errors)} errors")
+    except HTTPException as e:
+        job.status = "failed"
+        job.error = e.detail
+    except pd.errors.EmptyDataError:
+        job.status = "failed"
+        job.error = "Arquivo CSV está vazio"
+    except pd.errors.ParserError as e:
+        job.status = "failed"
+        job.error = f"Erro ao fazer parse do CSV: {str(e)}"
+    except UnicodeDecodeError:
+        job.status = "failed"
+        job.error = "Erro de codificação. Arquivo deve estar em UTF-8"
+    except Exception as e:
+        logger.error(f"Erro inesperado no import job {job.id}: {str(e)}")
+        job.status = "failed"
+        job.error = f"Erro interno do servidor: {str(e)}"
+    finally:
+        job.finished_at = datetime.now(timezone.utc)
+        os.unlink(path)
+        await asyncio.to_thread(save_import_job, job)
+
+# Registered Google Sheets sync. Each sheet keeps the slug -> content_hash (or
+# "deleted") snapshot of its last successful sync in sheet_sync_sheets, so a
+# run only writes rows that changed and deletes rows removed from the sheet,
+# whichever worker runs it. Registrations and run history live there too; the
+# scheduler runs on whichever worker holds the sheet_sync_scheduler lease.
+# sheet_sync_state only remembers the fetch entry this worker last synced, to
+# skip unchanged downloads (a 304).
+sheet_sync_urls: List[str] = list(SHEET_SYNC_URLS)
+sheet_sync_state: Dict[str, Dict[str, Any]] = {}
+sheet_sync_history: "deque[SheetSyncRun]" = deque(maxlen=SHEET_SYNC_HISTORY)
+# Held for two intervals and renewed every cycle, so another worker takes over
+# only after the scheduling worker is gone
+sheet_sync_scheduler = WriteLease('sheet_sync_scheduler', ttl_seconds=max(SHEET_SYNC_INTERVAL_SECONDS * 2, WRITE_LEASE_TTL_SECONDS))
+
+def load_sheet_snapshot(sheet_url: str) -> Dict[str, str]:
+    """Snapshot of the last successful sync of a sheet, {} before the first one"""
+    result = supabase.table('sheet_sync_sheets').select('snapshot').eq('sheet_url', sheet_url).execute()
+    return (result.data[0].get('snapshot') if result.data else None) or {}
+
+def save_sheet_snapshot(sheet_url: str, snapshot: Dict[str, str]) -> None:
+    supabase.table('sheet_sync_sheets').upsert({
+        'sheet_url': sheet_url,
+        'snapshot': snapshot,
+        'synced_at': datetime.now(timezone.utc).isoformat()
+    }, on_conflict='sheet_url').execute()
+
+def register_sheet(sheet_url: str) -> None:
+    """Add a sheet to the scheduled sync for every worker"""
+    supabase.table('sheet_sync_sheets').upsert(
+        {'sheet_url': sheet_url}, on_conflict='sheet_url', ignore_duplicates=True
+    ).execute()
+
+def registered_sheet_urls() -> List[str]:
+    """Sheets from SHEET_SYNC_URLS plus those registered through the API"""
+    urls = list(sheet_sync_urls)
+    try:
+        result = supabase.table('sheet_sync_sheets').select('sheet_url').execute()
+        urls += [row['sheet_url'] for row in result.data or [] if row['sheet_url'] not in urls]
+    except Exception as e:
+        logger.error(f"Error listing registered sheets: {str(e)}")
+    return urls
+
+def record_sheet_sync_run(run: SheetSyncRun) -> None:
+    sheet_sync_history.appendleft(run)
+    try:
+        supabase.table('sheet_sync_runs').insert({
+            'sheet_url': run.sheet_url,
+            'status': run.status,
+            'run': run.model_dump(mode='json'),
+            'started_at': run.started_at.isoformat()
+        }).execute()
+    except Exception as e:
+        logger.warning(f"Could not record sheet sync run: {str(e)}")
+
+def recent_sheet_sync_runs() -> List[SheetSyncRun]:
+    """Latest runs of every worker, newest first; this worker's own if the table can't be read"""
+    try:
+        result = supabase.table('sheet_sync_runs').select('run').order(
+            'started_at', desc=True
+        ).limit(SHEET_SYNC_HISTORY).execute()
+        return [SheetSyncRun.model_validate(row['run']) for row in result.data or []]
+    except Exception as e:
+        logger.error(f"Error reading sheet sync history: {str(e)}")
+        return list(sheet_sync_history)
+
+def apply_sheet_diff(sheet_url: str, df: pd.DataFrame, validation_errors: np.ndarray, run: SheetSyncRun) -> Optional[Dict[str, str]]:
+    """Write the rows of a sheet that changed since its last snapshot.
+    
+    Returns the new snapshot, or None when a row was rejected or a write
+    failed, so the next run diffs against the old snapshot again.
+    """
+    report = run.report
+    previous = load_sheet_snapshot(sheet_url)
+    current: Dict[str, str] = {}
+    upserts: Dict[str, tuple] = {}
+    errors_before = len(report.errors)
+    
+    for line_number, row, action in iter_valid_rows(df, validation_errors, report):
+        slug = row['slug']
+        if not slug:
+            report.errors.append(f"Linha {line_number}: Slug é obrigatório")
+            continue
+        
+        if action == 'delete':
+            current[slug] = "deleted"
+            upserts.pop(slug, None)
+        else:
+            current[slug] = build_template_data(row, slug)["content_hash"]
+            upserts[slug] = (line_number, row, action)
+    
+    # Rows that failed validation are still in the sheet: keep their last synced
+    # marker so they are neither deleted nor rewritten until they are fixed
+    for slug in df['slug']:
+        if isinstance(slug, str) and slug and slug not in current and slug in previous:
+            current[slug] = previous[slug]
+    
+    # Rows edited outside the import have their content_hash cleared by a trigger
+    # (updated_at_schema.sql); rewrite them from the sheet even if the sheet didn't change
+    edited = fetch_edited_slugs() if upserts else set()
+    changed = [item for slug, item in upserts.items() if previous.get(slug) != current[slug] or slug in edited]
+    deletes = [slug for slug, marker in current.items() if marker == "deleted" and previous.get(slug) != "deleted"]
+    deletes += [slug for slug, marker in previous.items() if marker != "deleted" and slug not in current]
+    
+    run.rows_total = len(df)
+    run.rows_changed = len(changed) + len(deletes)
+    
+    # Deletes are existence-filtered: rows already gone are not an error here
+    existing = fetch_existing_hashes(deletes) if deletes else {}
+    if existing:
+        try:
+            supabase.table('templates').delete().in_('slug', list(existing)).execute()
+            report.deleted += len(existing)
+            bump_catalog_version()
+        except Exception as e:
+            report.errors.append(f"Erro ao remover templates: {str(e)}")
+    
+    for start in range(0, len(changed), IMPORT_CHUNK_SIZE):
+        process_template_chunk(changed[start:start + IMPORT_CHUNK_SIZE], report)
+    
+    # Any error (validation included) keeps the old snapshot, so the next run retries
+    return current if len(report.errors) == errors_before else None
+
+async def sync_sheet(sheet_url: str) -> SheetSyncRun:
+    """Fetch a registered sheet and apply only what changed since the last sync"""
+    run = SheetSyncRun(sheet_url=sheet_url)
+    started = time.monotonic()
+    
+    try:
+        sheet = await sheet_fetcher.fetch(convert_google_sheets_url(sheet_url))
+        state = sheet_sync_state.get(sheet_url)
+        
+        if state and state["entry"] is sheet:
+            # 304 for the exact download we last synced
+            run.status = "not_modified"
+        else:
+            if sheet["parsed"] is None:
+                sheet["parsed"] = await asyncio.to_thread(parse_import_csv, BytesIO(sheet["content"]))
+                sheet["content"] = None
+            df, validation_errors = sheet["parsed"]
+            
+            async with import_write_lock:
+                snapshot = await asyncio.to_thread(apply_sheet_diff, sheet_url, df, validation_errors, run)
+                if snapshot is not None:
+                    await asyncio.to_thread(save_sheet_snapshot, sheet_url, snapshot)
+            
+            if snapshot is not None:
+                sheet_sync_state[sheet_url] = {"entry": sheet}
+            run.status = "completed"
+    except HTTPException as e:
+        run.status = "failed"
+        run.error = e.detail
+    except Exception as e:
+        logger.error(f"Erro ao sincronizar planilha {sheet_url}: {str(e)}")
+        run.status = "failed"
+        run.error = str(e)
+    finally:
+        run.duration_seconds = round(time.monotonic() - started, 3)
+        await asyncio.to_thread(record_sheet_sync_run, run)
+    
+    logger.info(f"Sheet sync {run.status} in {run.duration_seconds}s: {run.rows_changed}/{run.rows_total} rows changed, {run.report.inserted} inserted, {run.report.updated} updated, {run.report.deleted} deleted, {len(run.report.errors)} errors")
+    return run
+
+async def sheet_sync_loop() -> None:
+    """Sync every registered sheet, then sleep for SHEET_SYNC_INTERVAL_SECONDS
+    
+    Every worker runs this loop, but only the holder of the scheduler lease syncs.
+    """
+    while True:
+        try:
+            if await asyncio.to_thread(sheet_sync_scheduler.try_acquire):
+                for sheet_url in await asyncio.to_thread(registered_sheet_urls):
+                    await sync_sheet(sheet_url)
+        except Exception as e:
+            logger.error(f"Error running scheduled sheet sync: {str(e)}")
+        await asyncio.sleep(SHEET_SYNC_INTERVAL_SECONDS)
+
+RANKED_LIST_NAMES = ('featured', 'trending', 'newest', 'most_downloaded')
+ranked_lists_state: Dict[str, Any] = {"version": None, "built_at": 0.0, "lists": None}
+ranked_lists_lock = asyncio.Lock()
+
+def trending_score(template: Template, now: datetime) -> float:
+    """Downloads decayed by template age, gravity-style; breaks ties between equal recent counts"""
+    age_hours = max((now - template.created_at).total_seconds() / 3600, 0)
+    return template.downloads_count / (age_hours + 2) ** 1.5
+
+def bayesian_rating(template: Template, prior_mean: float) -> float:
+    """Average rating shrunk toward the catalog mean, so a single 5-star vote can't top the list"""
+    return (RATING_PRIOR_WEIGHT * prior_mean + template.rating_sum) / (RATING_PRIOR_WEIGHT + template.rating_count)
+
+def fetch_recent_downloads(since: datetime) -> Dict[str, int]:
+    """Per-template downloads since a point in time, read from the hourly rollups"""
+    try:
+        result = supabase.rpc('get_top_downloads_since', {'p_since': since.isoformat(), 'p_limit': 100}).execute()
+        return {row['template_id']: row['downloads'] for row in result.data or []}
+    except Exception as e:
+        logger.error(f"Error getting recent downloads: {str(e)}")
+        return {}
+
+def build_ranked_lists() -> Dict[str, List[Template]]:
+    """Read the published catalog once and cut every rail from it"""
+    result = supabase.table('templates').select(TEMPLATE_SELECT_COLUMNS).eq('status', 'published').execute()
+    
+    templates = []
+    for template in result.data or []:
+        # Convert datetime strings
+        if isinstance(template.get('created_at'), str):
+            template['created_at'] = datetime.fromisoformat(template['created_at'].replace('Z', '+00:00'))
+        if isinstance(template.get('updated_at'), str):
+            template['updated_at'] = datetime.fromisoformat(template['updated_at'].replace('Z', '+00:00'))
+        templates.append(Template(**template))
+    
+    total_votes = sum(t.rating_count for t in templates)
+    prior_mean = sum(t.rating_sum for t in templates) / total_votes if total_votes else RATING_PRIOR_MEAN_DEFAULT
+    for template in templates:
+        template.rating_score = round(bayesian_rating(template, prior_mean), 4)
+    
+    now = datetime.now(timezone.utc)
+    recent = fetch_recent_downloads(now - timedelta(hours=TRENDING_WINDOW_HOURS))
+    return {
+        'featured': heapq.nlargest(
+            RANKED_LIST_SIZE, templates, key=lambda t: (t.rating_score, t.rating_avg or 0, t.downloads_count)
+        ),
+        'trending': heapq.nlargest(
+            RANKED_LIST_SIZE, templates, key=lambda t: (recent.get(t.id, 0), trending_score(t, now))
+        ),
+        'newest': heapq.nlargest(RANKED_LIST_SIZE, templates, key=lambda t: t.created_at),
+        'most_downloaded': heapq.nlargest(RANKED_LIST_SIZE, templates, key=lambda t: (t.downloads_count, t.id))
+    }
+
+async def refresh_ranked_lists() -> None:
+    version = ranking_version()
+    lists = await asyncio.to_thread(build_ranked_lists)
+    ranked_lists_state.update(version=version, built_at=time.monotonic(), lists=lists)
+
+async def get_ranked_lists() -> Dict[str, List[Template]]:
+    """Precomputed rails; only the very first call (before the refresher ran) builds them inline"""
+    if ranked_lists_state["lists"] is None:
+        async with ranked_lists_lock:
+            if ranked_lists_state["lists"] is None:
+                await refresh_ranked_lists()
+    return ranked_lists_state["lists"]
+
+def ranked_lists_etag() -> str:
+    """ETag of the rails snapshot currently served, so it changes exactly when their body does"""
+    catalog_part, downloads_part = ranked_lists_state["version"] or (0, 0)
+    return f'W/"{CATALOG_ETAG_BOOT_ID}-r{catalog_part}.{downloads_part}-{ranked_lists_state["built_at"]:.3f}"'
+
+async def ranked_lists_loop() -> None:
+    """Rebuild the rails after catalog writes, download flushes and every RANKED_LISTS_REFRESH_SECONDS"""
+    while True:
+        stale = (
+            ranked_lists_state["version"] != ranking_version()
+            or time.monotonic() - ranked_lists_state["built_at"] >= RANKED_LISTS_REFRESH_SECONDS
+        )
+        if stale:
+            try:
+                async with ranked_lists_lock:
+                    await refresh_ranked_lists()
             except Exception as e:
-                report.errors.append(f"Linha {index + 2}: Erro inesperado - {str(e)}")
+                logger.error(f"Error refreshing ranked lists: {str(e)}")
+        await asyncio.sleep(RANKED_LISTS_POLL_SECONDS)
+
+class DownloadCounter:
+    """Write-behind download counter and event log
+    
+    Clicks are coalesced in memory per (template, minute) and appended to a
+    local journal; flush() sends them to Postgres in one call that adds the
+    per-template totals to downloads_count atomically and appends the
+    per-minute counts to the download event log.
+    
+    Every process journals to its own files in journal_dir and holds a lock
+    file on them for its lifetime, so several uvicorn workers never touch each
+    other's journals. On startup a worker adopts the journals whose lock is free
+    (their owner exited), so a crash loses no clicks (a crash in the middle of a
+    flush can count that batch twice).
+    """
+    
+    def __init__(self, journal_dir: Path):
+        self.journal_dir = journal_dir
+        self.journal_path: Optional[Path] = None
+        self.flushing_path: Optional[Path] = None
+        self.lock_path: Optional[Path] = None
+        self.lock_file = None
+        self.pending: Dict[Tuple[str, str], int] = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.journal = None
+    
+    def _claim(self) -> None:
+        """Create this process's journal names and take their lock (once per process)"""
+        if self.lock_file is not None:
+            return
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        name = f"downloads-{os.getpid()}-{secrets.token_hex(3)}"
+        self.lock_path = self.journal_dir / f"{name}.lock"
+        self.journal_path = self.journal_dir / f"{name}.log"
+        self.flushing_path = self.journal_dir / f"{name}.log.flushing"
+        self.lock_file = open(self.lock_path, 'w')
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    
+    def _journal_file(self):
+        if self.journal is None:
+            self._claim()
+            self.journal = open(self.journal_path, 'a', encoding='utf-8')
+        return self.journal
+    
+    def _append(self, counts: Dict[Tuple[str, str], int]) -> None:
+        journal = self._journal_file()
+        for (template_id, minute), count in counts.items():
+            journal.write(f"{template_id} {count} {minute}\n")
+        journal.flush()
+    
+    def _add(self, counts: Dict[Tuple[str, str], int]) -> None:
+        for key, count in counts.items():
+            self.pending[key] = self.pending.get(key, 0) + count
+    
+    @staticmethod
+    def current_minute() -> str:
+        return datetime.now(timezone.utc).replace(second=0, microsecond=0).isoformat()
+    
+    def _read_journal(self, path: Path) -> Dict[Tuple[str, str], int]:
+        counts: Dict[Tuple[str, str], int] = {}
+        if not path.exists():
+            return counts
+        for line in path.read_text(encoding='utf-8').splitlines():
+            parts = line.split()
+            if len(parts) < 2 or not parts[1].isdigit():
+                continue
+            # Lines without a minute predate the event log; date them now
+            key = (parts[0], parts[2] if len(parts) > 2 else self.current_minute())
+            counts[key] = counts.get(key, 0) + int(parts[1])
+        return counts
+    
+    def recover(self) -> int:
+        """Adopt clicks left in the journals of exited processes; returns how many"""
+        with self.lock:
+            self._claim()
+            recovered = 0
+            for lock_path in sorted(self.journal_dir.glob('downloads-*.lock')):
+                if lock_path == self.lock_path:
+                    continue
+                with open(lock_path, 'a') as owner_lock:
+                    try:
+                        fcntl.flock(owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # owner is still running
+                    
+                    journal_path = lock_path.with_suffix('.log')
+                    flushing_path = lock_path.with_suffix('.log.flushing')
+                    counts = self._read_journal(flushing_path)
+                    for key, count in self._read_journal(journal_path).items():
+                        counts[key] = counts.get(key, 0) + count
+                    
+                    # Durable in our journal before the orphan's files go away
+                    if counts:
+                        self._add(counts)
+                        self._append(counts)
+                    flushing_path.unlink(missing_ok=True)
+                    journal_path.unlink(missing_ok=True)
+                    lock_path.unlink(missing_ok=True)
+                    recovered += sum(counts.values())
+            return recovered
+    
+    def record(self, template_id: str) -> None:
+        key = (template_id, self.current_minute())
+        with self.lock:
+            self._add({key: 1})
+            self._append({key: 1})
+    
+    def flush(self) -> int:
+        """Apply pending clicks to downloads_count and the event log; returns how many were written"""
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return 0
+                batch, self.pending = self.pending, {}
+                # Clicks arriving during the round trip go to a new journal
+                self._journal_file().close()
+                self.journal = None
+                os.replace(self.journal_path, self.flushing_path)
+                self._journal_file()
+            
+            try:
+                supabase.rpc('record_download_batch', {
+                    'p_template_ids': [template_id for template_id, _ in batch],
+                    'p_minutes': [minute for _, minute in batch],
+                    'p_counts': list(batch.values())
+                }).execute()
+            except Exception:
+                # Put the batch back so the next flush retries it
+                with self.lock:
+                    self._add(batch)
+                    self._append(batch)
+                self.flushing_path.unlink(missing_ok=True)
+                raise
+            
+            self.flushing_path.unlink(missing_ok=True)
+            bump_downloads_version()
+            return sum(batch.values())
+    
+    def close(self) -> None:
+        """Release this process's journal; its files are removed when nothing is left to flush"""
+        with self.lock:
+            if self.lock_file is None:
+                return
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            if not self.pending:
+                self.journal_path.unlink(missing_ok=True)
+                self.lock_path.unlink(missing_ok=True)
+            self.lock_file.close()
+            self.lock_file = None
+
+download_counter = DownloadCounter(DOWNLOAD_JOURNAL_DIR)
+
+async def download_flush_loop() -> None:
+    """Flush coalesced download counts every DOWNLOAD_FLUSH_INTERVAL_SECONDS"""
+    while True:
+        await asyncio.sleep(DOWNLOAD_FLUSH_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(download_counter.flush)
+        except Exception as e:
+            logger.error(f"Error flushing download counts: {str(e)}")
+
+async def download_rollup_loop() -> None:
+    """Fold new download events into the hourly/daily rollups every DOWNLOAD_ROLLUP_INTERVAL_SECONDS"""
+    while True:
+        await asyncio.sleep(DOWNLOAD_ROLLUP_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(supabase.rpc('rollup_download_events').execute)
+        except Exception as e:
+            logger.error(f"Error rolling up download events: {str(e)}")
+
+# API Endpoints
+@api_router.post("/import/templates", response_model=ImportReport)
+async def import_templates(file: UploadFile = File(...), atomic: bool = False):
+    """Import templates from CSV file (atomic=true applies every row in one transaction)"""
+    
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Arquivo deve ser um CSV")
+    
+    report = ImportReport()
+    
+    try:
+        # Stream the upload: parse, validate and write one chunk at a time so
+        # peak memory depends on IMPORT_CHUNK_SIZE, not on the file size
+        await file.seek(0)
+        async with import_write_lock:
+            await asyncio.to_thread(run_template_import, file.file, report, None, atomic)
         
-        logger.info(f"Import completed: {report.inserted} inserted, {report.updated} updated, {report.deleted} deleted, {len(report.errors)} errors")
+        logger.info(f"Import completed: {report.inserted} inserted, {report.updated} updated, {report.unchanged} unchanged, {report.deleted} deleted, {len(report.errors)} errors")
         
         return report
         
+    except HTTPException:
+        raise
     except pd.errors.EmptyDataError:
         raise HTTPException(status_code=400, detail="Arquivo CSV está vazio")
     except pd.errors.ParserError as e:
@@ -627,6 +1887,34 @@ async def import_templates(file: UploadFile = File(...)):
         logger.error(f"Erro inesperado no import: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
 
+@api_router.post("/import/jobs", response_model=ImportJob, status_code=202)
+async def submit_import_job(background_tasks: BackgroundTasks, file: UploadFile = File(...), atomic: bool = False):
+    """Queue a CSV import to run in the background and return its job id"""
+    
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Arquivo deve ser um CSV")
+    
+    # The upload is closed once the response is sent, so spool it to disk
+    await file.seek(0)
+    with tempfile.NamedTemporaryFile(mode='wb', suffix='.csv', delete=False) as spool:
+        await asyncio.to_thread(shutil.copyfileobj, file.file, spool)
+        path = spool.name
+    
+    job = ImportJob(filename=file.filename, atomic=atomic, total_bytes=os.path.getsize(path))
+    await asyncio.to_thread(register_import_job, job)
+    background_tasks.add_task(run_import_job, job, path)
+    
+    return job
+
+@api_router.get("/import/jobs/{job_id}", response_model=ImportJob)
+async def get_import_job(job_id: str):
+    """Get progress, counters, throughput and ETA of an import job"""
+    # Jobs running on this worker are current in memory; others come from the table
+    job = import_jobs.get(job_id) or await asyncio.to_thread(load_import_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job de importação não encontrado")
+    return job
+
 @api_router.post("/import/preview", response_model=PreviewReport)
 async def preview_import(
     file: Optional[UploadFile] = File(None),
@@ -643,74 +1931,42 @@ async def preview_import(
     report = PreviewReport()
     
     try:
-        # Get CSV content
+        # Get parsed and validated CSV content
         if file:
             if not file.filename.endswith('.csv'):
                 raise HTTPException(status_code=400, detail="Arquivo deve ser um CSV")
             
-            content = await file.read()
-            csv_content = content.decode('utf-8')
+            await file.seek(0)
+            df, validation_errors = parse_import_csv(file.file)
         else:
             # Handle Google Sheets URL
             try:
                 csv_export_url = convert_google_sheets_url(sheet_url)
-                csv_content = await fetch_csv_from_url(csv_export_url)
+                sheet = await sheet_fetcher.fetch(csv_export_url)
             except ValueError as e:
                 raise HTTPException(status_code=400, detail=str(e))
-        
-        # Parse CSV
-        df = pd.read_csv(StringIO(csv_content))
-        
-        # Validate required columns - MORE FLEXIBLE
-        required_columns = ['action']  # Only action is truly required
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Coluna obrigatória ausente: {', '.join(missing_columns)}"
-            )
-        
-        # Auto-add missing common columns with defaults
-        if 'slug' not in df.columns and 'key' not in df.columns:
-            raise HTTPException(
-                status_code=400,
-                detail="É necessário ter pelo menos uma coluna 'slug' ou 'key' para identificar os registros"
-            )
-        
-        # If we have 'key' but not 'slug', use 'key' as 'slug'
-        if 'key' in df.columns and 'slug' not in df.columns:
-            df['slug'] = df['key']
-        
-        # Auto-add missing optional columns with defaults
-        optional_defaults = {
-            'title': 'Título não informado',
-            'platform': 'n8n',
-            'status': 'published',
-            'description': '',
-            'author_name': 'Admin',
-            'categories': '',
-            'tools': '',
-            'rating_avg': '',
-            'downloads_count': '0'
-        }
-        
-        for col, default_value in optional_defaults.items():
-            if col not in df.columns:
-                df[col] = default_value
+            
+            # An unchanged sheet (304) comes back with its parsed frame attached
+            if sheet["parsed"] is None:
+                sheet["parsed"] = parse_import_csv(BytesIO(sheet["content"]))
+                sheet["content"] = None
+            df, validation_errors = sheet["parsed"]
         
         report.total_rows = len(df)
         
+        # Resolve existence for the whole file in a few slug-only queries
+        existing_hashes = fetch_existing_hashes([slug for slug in df['slug'] if slug])
+        
         # Preview each row
-        for index, row in df.iterrows():
+        for position, (index, row) in enumerate(zip(df.index, df.to_dict('records'))):
+            action = row['action']
+            line_number = index + 2  # +2 because CSV starts at line 1 and we skip header
             try:
-                action = str(row.get('action', '')).strip().lower()
-                line_number = index + 2  # +2 because CSV starts at line 1 and we skip header
-                
                 if action not in ['upsert', 'delete']:
                     preview_row = PreviewRow(
                         line_number=line_number,
-                        slug=safe_str_strip(row.get('slug', '')),
-                        title=safe_str_strip(row.get('title', '')),
+                        slug=row['slug'],
+                        title=row['title'],
                         action=action,
                         status="error",
                         message=f"Ação inválida '{action}' (deve ser 'upsert' ou 'delete')"
@@ -720,7 +1976,7 @@ async def preview_import(
                     continue
                 
                 # Preview the row
-                preview_row = await preview_template_row(row.to_dict(), action, line_number)
+                preview_row = preview_template_row(row, action, line_number, validation_errors[position], existing_hashes)
                 report.rows.append(preview_row)
                 
                 # Update counters
@@ -728,6 +1984,8 @@ async def preview_import(
                     report.insert_count += 1
                 elif preview_row.status == "update":
                     report.update_count += 1
+                elif preview_row.status == "unchanged":
+                    report.unchanged_count += 1
                 elif preview_row.status == "delete":
                     report.delete_count += 1
                 else:
@@ -735,20 +1993,26 @@ async def preview_import(
                         
             except Exception as e:
                 preview_row = PreviewRow(
-                    line_number=index + 2,
-                    slug=safe_str_strip(row.get('slug', '')),
-                    title=safe_str_strip(row.get('title', '')),
-                    action=action if 'action' in locals() else 'unknown',
+                    line_number=line_number,
+                    slug=row['slug'],
+                    title=row['title'],
+                    action=action,
                     status="error",
                     message=f"Erro inesperado: {str(e)}"
                 )
                 report.rows.append(preview_row)
                 report.error_count += 1
         
-        logger.info(f"Preview completed: {report.total_rows} rows, {report.insert_count} insert, {report.update_count} update, {report.delete_count} delete, {report.error_count} errors")
+        stored = store_preview(df, validation_errors)
+        if stored:
+            report.preview_token, report.preview_expires_at = stored
+        
+        logger.info(f"Preview completed: {report.total_rows} rows, {report.insert_count} insert, {report.update_count} update, {report.unchanged_count} unchanged, {report.delete_count} delete, {report.error_count} errors")
         
         return report
         
+    except HTTPException:
+        raise
     except pd.errors.EmptyDataError:
         raise HTTPException(status_code=400, detail="Arquivo CSV está vazio")
     except pd.errors.ParserError as e:
@@ -759,30 +2023,115 @@ async def preview_import(
         logger.error(f"Erro inesperado no preview: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
 
+@api_router.post("/import/commit", response_model=ImportReport)
+async def commit_import(preview_token: str = Form(...), atomic: bool = False):
+    """Apply a previewed import by token, without re-uploading or re-parsing it"""
+    
+    entry = take_preview(preview_token)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Prévia não encontrada ou expirada. Valide o arquivo novamente")
+    
+    report = ImportReport()
+    
+    try:
+        async with import_write_lock:
+            await asyncio.to_thread(apply_preview, entry, report, atomic)
+        
+        logger.info(f"Import commit completed: {report.inserted} inserted, {report.updated} updated, {report.unchanged} unchanged, {report.deleted} deleted, {len(report.errors)} errors")
+        
+        return report
+        
+    except Exception as e:
+        logger.error(f"Erro inesperado no commit do import: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+@api_router.get("/import/sync", response_model=SheetSyncStatus)
+async def get_sheet_sync_status():
+    """List registered sheets and the recent sync history"""
+    return SheetSyncStatus(
+        sheets=await asyncio.to_thread(registered_sheet_urls),
+        interval_seconds=SHEET_SYNC_INTERVAL_SECONDS,
+        history=await asyncio.to_thread(recent_sheet_sync_runs)
+    )
+
+@api_router.post("/import/sync", response_model=List[SheetSyncRun])
+async def run_sheet_sync(sheet_url: Optional[str] = Form(None)):
+    """Register a sheet (if given) and sync it now, or sync every registered sheet"""
+    if sheet_url:
+        try:
+            convert_google_sheets_url(sheet_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            await asyncio.to_thread(register_sheet, sheet_url)
+        except Exception as e:
+            logger.error(f"Error registering sheet {sheet_url}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Erro ao registrar planilha: {str(e)}")
+        return [await sync_sheet(sheet_url)]
+    
+    return [await sync_sheet(url) for url in await asyncio.to_thread(registered_sheet_urls)]
+
 @api_router.get("/templates", response_model=PaginatedTemplateResponse)
 async def get_templates(
+    request: Request,
+    response: Response,
     search: Optional[str] = Query(None, description="Search in title, description, tags"),
     platform: Optional[str] = Query(None, description="Filter by platform"),
     category: Optional[str] = Query(None, description="Filter by category"),
     tool: Optional[str] = Query(None, description="Filter by tool"),
     user_id: Optional[str] = Query(None, description="User ID for favorites and ratings"),
     page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(15, ge=1, le=50, description="Items per page")
+    page_size: int = Query(15, ge=1, le=50, description="Items per page"),
+    include_facets: bool = Query(True, description="Include facet lists in the response"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from a previous next_cursor; overrides page. Not valid with search, which pages by page")
 ):
     """Get templates with advanced filtering, pagination, and user data"""
-    return get_templates_with_user_data(
+    if user_id:
+        # Favorites are per user and don't move the catalog version
+        response.headers["Cache-Control"] = "private, no-cache"
+    else:
+        not_modified = catalog_not_modified(request, response, catalog_etag(with_downloads=True))
+        if not_modified:
+            return not_modified
+    
+    return await get_templates_with_user_data(
         user_id=user_id,
         search=search,
         platform=platform,
         category=category,
         tool=tool,
         page=page,
-        page_size=page_size
+        page_size=page_size,
+        include_facets=include_facets,
+        cursor=cursor
     )
 
+@api_router.get("/suggest", response_model=List[Suggestion])
+async def suggest(
+    q: str = Query(..., min_length=1, description="Prefix typed so far"),
+    limit: int = Query(8, ge=1, le=SUGGEST_MAX_LIMIT, description="Maximum suggestions")
+):
+    """Top titles, tags, tools and categories starting with the prefix"""
+    index = await get_suggest_index()
+    return index.lookup(q, limit) if index else []
+
+@api_router.get("/facets", response_model=TemplateFacetCounts)
+async def get_facet_counts(
+    search: Optional[str] = Query(None, description="Search in title, description, tags"),
+    platform: Optional[str] = Query(None, description="Filter by platform"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    tool: Optional[str] = Query(None, description="Filter by tool")
+):
+    """Get platform, category and tool counts for the templates matching the filters"""
+    return await asyncio.to_thread(get_template_facet_counts, search, platform, category, tool)
+
 @api_router.get("/templates/{template_id}", response_model=Template)
-async def get_template(template_id: str):
-    result = supabase.table('templates').select('*').eq('id', template_id).execute()
+async def get_template(template_id: str, request: Request, response: Response):
+    not_modified = catalog_not_modified(request, response, catalog_etag(with_downloads=True))
+    if not_modified:
+        return not_modified
+    
+    result = supabase.table('templates').select(TEMPLATE_SELECT_COLUMNS).eq('id', template_id).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Template não encontrado")
     
@@ -796,8 +2145,12 @@ async def get_template(template_id: str):
     return Template(**template)
 
 @api_router.get("/templates/slug/{slug}", response_model=Template)
-async def get_template_by_slug(slug: str):
-    result = supabase.table('templates').select('*').eq('slug', slug).execute()
+async def get_template_by_slug(slug: str, request: Request, response: Response):
+    not_modified = catalog_not_modified(request, response, catalog_etag(with_downloads=True))
+    if not_modified:
+        return not_modified
+    
+    result = supabase.table('templates').select(TEMPLATE_SELECT_COLUMNS).eq('slug', slug).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Template não encontrado")
     
@@ -811,40 +2164,90 @@ async def get_template_by_slug(slug: str):
     return Template(**template)
 
 @api_router.get("/categories", response_model=List[Category])
-async def get_categories():
+async def get_categories(request: Request, response: Response):
+    not_modified = catalog_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    
     result = supabase.table('categories').select('*').execute()
     return [Category(key=cat['key'], name=cat['name']) for cat in result.data]
 
 @api_router.get("/tools", response_model=List[Tool])
-async def get_tools():
+async def get_tools(request: Request, response: Response):
+    not_modified = catalog_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    
     result = supabase.table('tools').select('*').execute()
     return [Tool(key=tool['key'], name=tool['name']) for tool in result.data]
 
 @api_router.get("/featured", response_model=List[Template])
-async def get_featured_templates():
-    result = supabase.table('templates').select('*').eq('status', 'published').order('rating_avg', desc=True).limit(6).execute()
+async def get_featured_templates(request: Request, response: Response):
+    lists = await get_ranked_lists()
+    not_modified = catalog_not_modified(request, response, ranked_lists_etag())
+    if not_modified:
+        return not_modified
     
-    templates = []
-    for template in result.data:
-        # Convert datetime strings
-        if isinstance(template.get('created_at'), str):
-            template['created_at'] = datetime.fromisoformat(template['created_at'].replace('Z', '+00:00'))
-        if isinstance(template.get('updated_at'), str):
-            template['updated_at'] = datetime.fromisoformat(template['updated_at'].replace('Z', '+00:00'))
-        templates.append(Template(**template))
+    return lists['featured'][:6]
+
+@api_router.get("/rails/{rail}", response_model=List[Template])
+async def get_rail(
+    rail: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(12, ge=1, le=RANKED_LIST_SIZE, description="Items in the rail")
+):
+    """Home-page rail: featured, trending, newest or most_downloaded"""
+    if rail not in RANKED_LIST_NAMES:
+        raise HTTPException(status_code=404, detail="Lista não encontrada")
     
-    return templates
+    lists = await get_ranked_lists()
+    not_modified = catalog_not_modified(request, response, ranked_lists_etag())
+    if not_modified:
+        return not_modified
+    
+    return lists[rail][:limit]
 
 @api_router.post("/templates/{template_id}/download")
 async def download_template(template_id: str):
-    # Increment download count
-    result = supabase.table('templates').select('downloads_count').eq('id', template_id).execute()
-    if result.data:
-        current_count = result.data[0].get('downloads_count', 0)
-        supabase.table('templates').update({'downloads_count': current_count + 1}).eq('id', template_id).execute()
+    try:
+        uuid.UUID(template_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Template não encontrado")
     
+    # Counted in memory and journaled; the flusher applies it to downloads_count
+    download_counter.record(template_id)
     return {"message": "Download registrado"}
 
+@api_router.get("/analytics/downloads", response_model=DownloadSeries)
+async def get_download_series(
+    template_id: Optional[str] = Query(None, description="Template ID; omit for the whole catalog"),
+    granularity: str = Query("day", pattern="^(hour|day)$", description="Bucket size"),
+    days: int = Query(7, ge=1, le=90, description="How many days back")
+):
+    """Downloads per hour or day, read from the rollup tables"""
+    if template_id:
+        try:
+            uuid.UUID(template_id)
+        except ValueError:
+            raise HTTPException(status_code=404, detail="Template não encontrado")
+    
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    result = await asyncio.to_thread(
+        supabase.rpc('get_download_series', {
+            'p_granularity': granularity,
+            'p_since': since.isoformat(),
+            'p_template_id': template_id
+        }).execute
+    )
+    buckets = [DownloadBucket(bucket=row['bucket'], downloads=row['downloads']) for row in result.data or []]
+    return DownloadSeries(
+        granularity=granularity,
+        template_id=template_id,
+        total=sum(bucket.downloads for bucket in buckets),
+        buckets=buckets
+    )
+
 # Import endpoints for specific sections
 @api_router.post("/import/platforms/preview", response_model=PreviewReport)
 async def preview_platforms_import(
@@ -900,25 +2303,143 @@ async def import_agents(file: UploadFile = File(...)):
     """Import GPT agents from CSV file"""
     return await import_templates(file)
 
+user_data_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+user_data_cache_stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+# In-flight full loads, at most one per user: {"task": Task, "stale": bool}.
+# Readers share the running load; a write landing mid-load marks it stale so
+# what it read is not cached. The dict also keeps the tasks referenced.
+user_data_loads: Dict[str, Dict[str, Any]] = {}
+# Bumped by every favorite/rating write; a page lookup that saw it move while
+# in flight does not merge its (possibly stale) result into the cache
+user_data_write_seq = 0
+
+def get_cached_user_data(user_id: str) -> Optional[Dict[str, Any]]:
+    """Cached entry for a user, or None on a miss
+    
+    {"favorites": set, "ratings": dict, "complete": bool, "known": set}: a
+    complete entry holds the user's whole history (loaded for /favorites);
+    otherwise it only answers for the template ids in "known", filled by
+    page-scoped lookups.
+    """
+    entry = user_data_cache.get(user_id)
+    if entry and entry["expires"] > time.monotonic():
+        user_data_cache.move_to_end(user_id)
+        user_data_cache_stats["hits"] += 1
+        return entry
+    if entry:
+        del user_data_cache[user_id]
+    user_data_cache_stats["misses"] += 1
+    return None
+
+def store_user_data(user_id: str, favorites: set, ratings: Dict[str, int], known: Optional[set] = None) -> Dict[str, Any]:
+    """Cache a user's data; without ``known`` it is their complete history"""
+    entry = user_data_cache[user_id] = {
+        "favorites": favorites,
+        "ratings": ratings,
+        "complete": known is None,
+        "known": known if known is not None else set(),
+        "expires": time.monotonic() + USER_DATA_CACHE_TTL_SECONDS
+    }
+    user_data_cache.move_to_end(user_id)
+    while len(user_data_cache) > USER_DATA_CACHE_SIZE:
+        user_data_cache.popitem(last=False)
+        user_data_cache_stats["evictions"] += 1
+    return entry
+
+def merge_user_template_data(user_id: str, template_ids: List[str], favorites: set, ratings: Dict[str, int]) -> Dict[str, Any]:
+    """Add a page-scoped lookup to the user's cache entry, creating a partial one if needed"""
+    entry = user_data_cache.get(user_id)
+    if entry is None or entry["expires"] <= time.monotonic():
+        entry = store_user_data(user_id, set(), {}, known=set())
+    ids = set(template_ids)
+    entry["known"] |= ids
+    entry["favorites"] = (entry["favorites"] - ids) | favorites
+    for template_id in ids:
+        entry["ratings"].pop(template_id, None)
+    entry["ratings"].update(ratings)
+    return entry
+
+def fetch_all_rows(query_for_range) -> List[Dict[str, Any]]:
+    """Page through a query in USER_DATA_LOAD_PAGE_SIZE ranges so max-rows can't truncate it"""
+    rows: List[Dict[str, Any]] = []
+    while True:
+        start = len(rows)
+        page = query_for_range().range(start, start + USER_DATA_LOAD_PAGE_SIZE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < USER_DATA_LOAD_PAGE_SIZE:
+            return rows
+
+def load_user_data(user_id: str) -> Tuple[set, Dict[str, int]]:
+    """All of a user's favorites and ratings (runs in a worker thread)"""
+    favorites = fetch_all_rows(
+        lambda: supabase.table('favorites').select('template_id').eq('user_id', user_id).order('template_id')
+    )
+    ratings = fetch_all_rows(
+        lambda: supabase.table('ratings').select('template_id, rating').eq('user_id', user_id).order('template_id')
+    )
+    return (
+        {fav['template_id'] for fav in favorites},
+        {rating['template_id']: rating['rating'] for rating in ratings}
+    )
+
+async def load_and_cache_user_data(user_id: str, load: Dict[str, Any]) -> Tuple[set, Dict[str, int]]:
+    try:
+        favorites, ratings = await asyncio.to_thread(load_user_data, user_id)
+        if not load["stale"]:
+            store_user_data(user_id, favorites, ratings)
+        return favorites, ratings
+    finally:
+        if user_data_loads.get(user_id) is load:
+            del user_data_loads[user_id]
+
+def log_user_data_load_error(task: asyncio.Task) -> None:
+    # Background loads may have no awaiter left to see the error
+    if not task.cancelled() and task.exception():
+        logger.error(f"Error loading user data: {str(task.exception())}")
+
+def start_user_data_load(user_id: str) -> asyncio.Task:
+    """The user's in-flight full load, started if none is running"""
+    load = user_data_loads.get(user_id)
+    if load is None:
+        load = {"task": None, "stale": False}
+        user_data_loads[user_id] = load
+        load["task"] = asyncio.create_task(load_and_cache_user_data(user_id, load))
+        load["task"].add_done_callback(log_user_data_load_error)
+    return load["task"]
+
+def note_user_data_write(user_id: str) -> Optional[Dict[str, Any]]:
+    """Flag in-flight lookups as stale and return the cache entry to update in place, if any"""
+    global user_data_write_seq
+    user_data_write_seq += 1
+    load = user_data_loads.get(user_id)
+    if load:
+        load["stale"] = True
+    return user_data_cache.get(user_id)
+
+@api_router.get("/cache/user-data", response_model=UserDataCacheStats)
+async def get_user_data_cache_stats():
+    """Size and hit/miss counters of the per-user favorites/ratings cache"""
+    return UserDataCacheStats(size=len(user_data_cache), max_size=USER_DATA_CACHE_SIZE, **user_data_cache_stats)
+
 @api_router.post("/templates/{template_id}/favorite")
 async def toggle_favorite(template_id: str, user_id: str = Form(...)):
     """Toggle favorite status for a template"""
     try:
-        # Check if already favorited
-        existing = supabase.table('favorites').select('*').eq('user_id', user_id).eq('template_id', template_id).execute()
+        # Delete-or-insert in a single statement, so concurrent toggles can't interleave
+        result = supabase.rpc('toggle_favorite', {'p_user_id': user_id, 'p_template_id': template_id}).execute()
+        
+        # Write-through: keep a cached favorite set in step with the database
+        entry = note_user_data_write(user_id)
+        if entry:
+            if result.data:
+                entry["favorites"].add(template_id)
+            else:
+                entry["favorites"].discard(template_id)
         
-        if existing.data:
-            # Remove favorite
-            supabase.table('favorites').delete().eq('user_id', user_id).eq('template_id', template_id).execute()
-            return {"favorited": False, "message": "Removido dos favoritos"}
-        else:
-            # Add favorite
-            supabase.table('favorites').insert({
-                "user_id": user_id,
-                "template_id": template_id
-            }).execute()
+        if result.data:
             return {"favorited": True, "message": "Adicionado aos favoritos"}
-            
+        return {"favorited": False, "message": "Removido dos favoritos"}
+        
     except Exception as e:
         logger.error(f"Error toggling favorite: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao alterar favorito: {str(e)}")
@@ -930,13 +2451,19 @@ async def rate_template(template_id: str, user_id: str = Form(...), rating: int
         raise HTTPException(status_code=400, detail="Rating deve estar entre 1 e 5")
     
     try:
-        # Upsert rating (insert or update)
+        # Upsert rating (insert or update); one rating per user and template
         result = supabase.table('ratings').upsert({
             "user_id": user_id,
             "template_id": template_id,
             "rating": rating,
             "updated_at": datetime.now(timezone.utc).isoformat()
-        }).execute()
+        }, on_conflict='user_id,template_id').execute()
+        # The ratings trigger applies the delta to the template's rating aggregates
+        bump_catalog_version()
+        
+        entry = note_user_data_write(user_id)
+        if entry:
+            entry["ratings"][template_id] = rating
         
         return {"success": True, "rating": rating, "message": f"Avaliação de {rating} estrelas registrada"}
         
@@ -948,72 +2475,334 @@ async def rate_template(template_id: str, user_id: str = Form(...), rating: int
 async def get_user_favorites(user_id: str):
     """Get user's favorite templates"""
     try:
-        result = supabase.table('favorites').select('template_id').eq('user_id', user_id).execute()
-        template_ids = [fav['template_id'] for fav in result.data]
-        return {"template_ids": template_ids}
+        cached = get_cached_user_data(user_id)
+        if cached and cached["complete"]:
+            favorites = cached["favorites"]
+        else:
+            # shield: a cancelled request must not cancel a load other readers share
+            favorites = (await asyncio.shield(start_user_data_load(user_id)))[0]
+        return {"template_ids": list(favorites)}
     except Exception as e:
         logger.error(f"Error getting favorites: {str(e)}")
         return {"template_ids": []}
 
-def get_templates_with_user_data(
+@api_router.post("/user/{user_id}/favorites/sync", response_model=FavoritesSyncResult)
+async def sync_user_favorites(user_id: str, request: FavoritesSyncRequest):
+    """Add and remove many favorites in one call; returns the user's resulting favorites"""
+    try:
+        for template_id in request.add + request.remove:
+            uuid.UUID(template_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="IDs de template inválidos")
+    
+    try:
+        result = await asyncio.to_thread(
+            supabase.rpc('sync_favorites', {
+                'p_user_id': user_id,
+                'p_add': request.add,
+                'p_remove': request.remove
+            }).execute
+        )
+        row = result.data[0]
+        entry = note_user_data_write(user_id)
+        if entry:
+            entry["favorites"] = set(row['template_ids'] or [])
+        return FavoritesSyncResult(added=row['added'], removed=row['removed'], template_ids=row['template_ids'] or [])
+    except Exception as e:
+        logger.error(f"Error syncing favorites: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao sincronizar favoritos: {str(e)}")
+
+async def fetch_user_template_data(user_id: Optional[str], template_ids: List[str]) -> Tuple[set, Dict[str, int]]:
+    """Get which of the given templates the user favorited and rated, in one lookup"""
+    if not user_id or not template_ids:
+        return set(), {}
+    
+    cached = get_cached_user_data(user_id)
+    if cached and cached["complete"]:
+        return cached["favorites"], cached["ratings"]
+    missing = [template_id for template_id in template_ids if not cached or template_id not in cached["known"]]
+    if not missing:
+        return cached["favorites"], cached["ratings"]
+    
+    write_seq = user_data_write_seq
+    try:
+        # Scoped to the ids not cached yet, so the cost follows page size rather than the user's history
+        result = await asyncio.to_thread(
+            supabase.rpc('get_user_template_data', {'p_user_id': user_id, 'p_template_ids': missing}).execute
+        )
+    except Exception as e:
+        logger.error(f"Error getting user data: {str(e)}")
+        return (cached["favorites"], cached["ratings"]) if cached else (set(), {})
+    
+    user_favorites = {row['template_id'] for row in result.data or [] if row.get('is_favorited')}
+    user_ratings = {row['template_id']: row['rating'] for row in result.data or [] if row.get('rating') is not None}
+    if write_seq == user_data_write_seq:
+        entry = merge_user_template_data(user_id, missing, user_favorites, user_ratings)
+        return entry["favorites"], entry["ratings"]
+    if cached:
+        return cached["favorites"] | user_favorites, {**cached["ratings"], **user_ratings}
+    return user_favorites, user_ratings
+
+def fetch_listing_page(
+    platform: Optional[str],
+    category: Optional[str],
+    tool: Optional[str],
+    page: int,
+    page_size: int,
+    keyset: Optional[Tuple[int, str]] = None
+) -> Tuple[List[Dict[str, Any]], int]:
+    """One page of published templates by downloads, plus the filtered total"""
+    # count='exact' returns the total with the page
+    query = supabase.table('templates').select(TEMPLATE_SELECT_COLUMNS, count='exact').eq('status', 'published')
+    
+    if platform:
+        query = query.eq('platform', platform)
+    if category:
+        query = query.contains('categories', [category])
+    if tool:
+        query = query.contains('tools', [tool])
+    
+    # id breaks ties so the order is total and keyset pages never overlap
+    query = query.order('downloads_count', desc=True).order('id', desc=True)
+    if keyset:
+        after_downloads, after_id = keyset
+        query = query.or_(
+            f"downloads_count.lt.{after_downloads},"
+            f"and(downloads_count.eq.{after_downloads},id.lt.{after_id})"
+        )
+        query = query.limit(page_size)
+    else:
+        skip = (page - 1) * page_size
+        query = query.range(skip, skip + page_size - 1)
+    
+    result = query.execute()
+    templates = result.data
+    return templates, result.count if result.count is not None else len(templates)
+
+def search_templates_page(
+    search: str,
+    platform: Optional[str],
+    category: Optional[str],
+    tool: Optional[str],
+    limit: int,
+    offset: int
+) -> Tuple[List[Dict[str, Any]], int]:
+    """One page of full-text search results ranked by relevance, plus the match total"""
+    # The term is passed as a parameter and parsed by websearch_to_tsquery in
+    # the database, never spliced into a PostgREST filter string
+    result = supabase.rpc('search_templates', {
+        'p_query': search,
+        'p_platform': platform or None,
+        'p_category': category or None,
+        'p_tool': tool or None,
+        'p_limit': limit,
+        'p_offset': offset
+    }).execute()
+    rows = result.data or []
+    # A page past the last match comes back as one row with no template, carrying the total
+    return [row['template'] for row in rows if row['template'] is not None], rows[0]['total'] if rows else 0
+
+def catalog_row_fingerprint(row: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Fields that change on any edit, download or rating; a differing fingerprint means reload the row
+    
+    updated_at moves on every edit, including ones made outside the API
+    (updated_at_schema.sql keeps it current with a trigger).
+    """
+    return (row.get('updated_at'), row.get('downloads_count'), row.get('rating_avg'), row.get('rating_count'))
+
+class CatalogIndex:
+    """Columnar in-memory copy of the published catalog
+    
+    Rows are stored in listing order (downloads_count, id descending), with
+    NumPy columns for the sort keys and one boolean mask per platform, category
+    and tool, so a filtered page is a few vectorized ANDs and a slice.
+    """
+    
+    def __init__(self, rows_by_id: Dict[str, Dict[str, Any]]):
+        self.rows_by_id = rows_by_id
+        self.fingerprints = {template_id: catalog_row_fingerprint(row) for template_id, row in rows_by_id.items()}
+        self.templates = sorted(
+            rows_by_id.values(),
+            key=lambda row: (row.get('downloads_count') or 0, row['id']),
+            reverse=True
+        )
+        size = len(self.templates)
+        self.ids = np.array([row['id'] for row in self.templates], dtype=object)
+        self.downloads = np.array([row.get('downloads_count') or 0 for row in self.templates], dtype=np.int64)
+        self.ratings = np.array(
+            [row['rating_avg'] if row.get('rating_avg') is not None else np.nan for row in self.templates],
+            dtype=np.float64
+        )
+        self.empty = np.zeros(size, dtype=bool)
+        self.platform_bits = self._membership(lambda row: [row.get('platform')], size)
+        self.category_bits = self._membership(lambda row: row.get('categories') or [], size)
+        self.tool_bits = self._membership(lambda row: row.get('tools') or [], size)
+    
+    def _membership(self, values_of, size: int) -> Dict[str, np.ndarray]:
+        bits: Dict[str, np.ndarray] = {}
+        for position, row in enumerate(self.templates):
+            for value in values_of(row):
+                if value:
+                    bits.setdefault(value, np.zeros(size, dtype=bool))[position] = True
+        return bits
+    
+    def page(
+        self,
+        platform: Optional[str],
+        category: Optional[str],
+        tool: Optional[str],
+        page: int,
+        page_size: int,
+        keyset: Optional[Tuple[int, str]] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Same contract as fetch_listing_page, answered from memory"""
+        mask = np.ones(len(self.templates), dtype=bool)
+        for bits, value in ((self.platform_bits, platform), (self.category_bits, category), (self.tool_bits, tool)):
+            if value:
+                mask &= bits.get(value, self.empty)
+        positions = np.flatnonzero(mask)
+        total = len(positions)
+        
+        if keyset:
+            after_downloads, after_id = keyset
+            downloads = self.downloads[positions]
+            after = (downloads < after_downloads) | ((downloads == after_downloads) & (self.ids[positions] < after_id))
+            positions = positions[after][:page_size]
+        else:
+            skip = (page - 1) * page_size
+            positions = positions[skip:skip + page_size]
+        
+        # Callers decorate the rows in place, so hand out copies
+        return [dict(self.templates[position]) for position in positions], total
+
+def refresh_catalog_index(previous: Optional[CatalogIndex]) -> CatalogIndex:
+    """Build the next index, reloading only rows that are new or whose fingerprint changed"""
+    light = supabase.table('templates').select(
+        'id, updated_at, downloads_count, rating_avg, rating_count'
+    ).eq('status', 'published').execute()
+    
+    known = previous.fingerprints if previous else {}
+    rows_by_id: Dict[str, Dict[str, Any]] = {}
+    stale_ids = []
+    for row in light.data or []:
+        if known.get(row['id']) == catalog_row_fingerprint(row):
+            rows_by_id[row['id']] = previous.rows_by_id[row['id']]
+        else:
+            stale_ids.append(row['id'])
+    
+    for i in range(0, len(stale_ids), SLUG_LOOKUP_BATCH_SIZE):
+        batch = stale_ids[i:i + SLUG_LOOKUP_BATCH_SIZE]
+        result = supabase.table('templates').select(TEMPLATE_SELECT_COLUMNS).in_('id', batch).eq('status', 'published').execute()
+        for row in result.data or []:
+            rows_by_id[row['id']] = row
+    
+    return CatalogIndex(rows_by_id)
+
+catalog_index_state: Dict[str, Any] = {"version": None, "expires": 0.0, "index": None}
+catalog_index_lock = asyncio.Lock()
+
+async def get_catalog_index() -> CatalogIndex:
+    """Current catalog index, refreshed after catalog writes, download flushes or TTL expiry"""
+    def fresh() -> bool:
+        return (
+            catalog_index_state["index"] is not None
+            and catalog_index_state["version"] == ranking_version()
+            and catalog_index_state["expires"] > time.monotonic()
+        )
+    
+    if not fresh():
+        # One refresh at a time; requests that queued behind it reuse its result
+        async with catalog_index_lock:
+            if not fresh():
+                version = ranking_version()
+                index = await asyncio.to_thread(refresh_catalog_index, catalog_index_state["index"])
+                catalog_index_state.update(
+                    index=index, version=version, expires=time.monotonic() + CATALOG_CACHE_TTL_SECONDS
+                )
+    return catalog_index_state["index"]
+
+async def catalog_index_page(
+    platform: Optional[str],
+    category: Optional[str],
+    tool: Optional[str],
+    page: int,
+    page_size: int,
+    keyset: Optional[Tuple[int, str]] = None
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Listing page from the in-process index, falling back to Supabase if it can't be loaded"""
+    try:
+        index = await get_catalog_index()
+    except Exception as e:
+        logger.error(f"Error refreshing catalog index: {str(e)}")
+        return await asyncio.to_thread(fetch_listing_page, platform, category, tool, page, page_size, keyset)
+    return index.page(platform, category, tool, page, page_size, keyset)
+
+def encode_listing_cursor(template: Dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing after the given (downloads_count, id) row"""
+    payload = json.dumps([template.get('downloads_count') or 0, template['id']])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_listing_cursor(cursor: str) -> Tuple[int, str]:
+    """Inverse of encode_listing_cursor; raises ValueError on malformed cursors"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        downloads_count, template_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return int(downloads_count), str(uuid.UUID(str(template_id)))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+async def get_templates_with_user_data(
     user_id: Optional[str] = None,
     search: Optional[str] = None,
     platform: Optional[str] = None,
     category: Optional[str] = None,
     tool: Optional[str] = None,
     page: int = 1,
-    page_size: int = 15  # Changed default to 15
+    page_size: int = 15,  # Changed default to 15
+    include_facets: bool = True,
+    cursor: Optional[str] = None
 ) -> PaginatedTemplateResponse:
-    """Get templates with user-specific data (favorites, ratings)"""
+    """Get templates with user-specific data (favorites, ratings)
+    
+    With a cursor the page is selected by keyset on (downloads_count, id)
+    instead of by offset, so deep pages cost the same as the first one.
+    Searches are ordered by relevance and always page by offset, so a cursor
+    combined with a search is rejected rather than silently ignored.
+    """
+    search_term = (search or '').strip()
+    if cursor and search_term:
+        raise HTTPException(status_code=400, detail="Cursor de paginação não pode ser usado com busca; use page")
+    
+    if cursor:
+        try:
+            after_downloads, after_id = decode_listing_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
     
     try:
-        # Start with base query
-        query = supabase.table('templates').select('*', count='exact').eq('status', 'published')
-        
-        # Add platform filter
-        if platform:
-            query = query.eq('platform', platform)
-        
-        # Add category filter
-        if category:
-            query = query.contains('categories', [category])
-        
-        # Add tool filter
-        if tool:
-            query = query.contains('tools', [tool])
-        
-        # Enhanced search functionality
-        if search:
-            search_term = search.lower().strip()
-            search_query = f"title.ilike.*{search_term}*,description.ilike.*{search_term}*,tags.ilike.*{search_term}*,author_name.ilike.*{search_term}*,platform.ilike.*{search_term}*"
-            query = query.or_(search_query)
-        
-        # Get total count first
-        count_result = query.execute()
-        total = count_result.count if hasattr(count_result, 'count') else len(count_result.data)
-        
-        # Apply pagination and ordering
-        skip = (page - 1) * page_size
-        paginated_query = query.order('downloads_count', desc=True).range(skip, skip + page_size - 1)
-        
-        result = paginated_query.execute()
-        templates = result.data
-        
-        # Get user favorites and ratings if user_id provided
-        user_favorites = set()
-        user_ratings = {}
-        
-        if user_id:
-            try:
-                # Get user favorites
-                favorites_result = supabase.table('favorites').select('template_id').eq('user_id', user_id).execute()
-                user_favorites = {fav['template_id'] for fav in favorites_result.data}
-                
-                # Get user ratings
-                ratings_result = supabase.table('ratings').select('template_id, rating').eq('user_id', user_id).execute()
-                user_ratings = {rating['template_id']: rating['rating'] for rating in ratings_result.data}
-            except Exception as e:
-                logger.error(f"Error getting user data: {str(e)}")
+        if search_term:
+            # Ranked full-text search; relevance order has no keyset, so it pages by offset
+            page_task = asyncio.to_thread(
+                search_templates_page, search_term, platform, category, tool, page_size, (page - 1) * page_size
+            )
+        else:
+            keyset = (after_downloads, after_id) if cursor else None
+            if CATALOG_INDEX_ENABLED:
+                page_task = catalog_index_page(platform, category, tool, page, page_size, keyset)
+            else:
+                page_task = asyncio.to_thread(fetch_listing_page, platform, category, tool, page, page_size, keyset)
+        
+        async def page_with_user_data():
+            templates, total = await page_task
+            user_data = await fetch_user_template_data(user_id, [template['id'] for template in templates])
+            return templates, total, user_data
+        
+        # User data needs the page's ids, but facets are independent of both,
+        # so they load concurrently in worker threads
+        (templates, total, (user_favorites, user_ratings)), facets = await asyncio.gather(
+            page_with_user_data(),
+            load_listing_facets(include_facets)
+        )
         
         # Convert to Template objects with user data
         template_items = []
@@ -1033,8 +2822,10 @@ def get_templates_with_user_data(
         # Calculate pagination
         total_pages = (total + page_size - 1) // page_size
         
-        # Get facets
-        facets = get_template_facets()
+        # A short page means there is nothing after it
+        next_cursor = None
+        if not search_term and len(templates) == page_size:
+            next_cursor = encode_listing_cursor(templates[-1])
         
         return PaginatedTemplateResponse(
             items=template_items,
@@ -1046,7 +2837,8 @@ def get_templates_with_user_data(
                 "platforms": facets.platforms,
                 "categories": facets.categories,
                 "tools": facets.tools
-            }
+            },
+            next_cursor=next_cursor
         )
         
     except Exception as e:
@@ -1063,6 +2855,39 @@ def get_templates_with_user_data(
 # Include router
 app.include_router(api_router)
 
+@app.on_event("startup")
+async def start_sheet_sync():
+    if SHEET_SYNC_INTERVAL_SECONDS > 0:
+        app.state.sheet_sync_task = asyncio.create_task(sheet_sync_loop())
+
+@app.on_event("startup")
+async def start_ranked_lists():
+    app.state.ranked_lists_task = asyncio.create_task(ranked_lists_loop())
+
+@app.on_event("startup")
+async def start_download_counter():
+    recovered = await asyncio.to_thread(download_counter.recover)
+    if recovered:
+        logger.info(f"Recovered {recovered} unflushed downloads from the journal")
+    app.state.download_flush_task = asyncio.create_task(download_flush_loop())
+    if DOWNLOAD_ROLLUP_INTERVAL_SECONDS > 0:
+        app.state.download_rollup_task = asyncio.create_task(download_rollup_loop())
+
+@app.on_event("shutdown")
+async def shutdown_background_tasks():
+    for name in ('sheet_sync_task', 'ranked_lists_task', 'download_flush_task', 'download_rollup_task'):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    await sheet_fetcher.aclose()
+    
+    # Last flush; whatever fails stays in the journal for the next start
+    try:
+        await asyncio.to_thread(download_counter.flush)
+    except Exception as e:
+        logger.error(f"Error flushing download counts on shutdown: {str(e)}")
+    download_counter.close()
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -0,0 +1,23 @@
+-- Scheduled Google Sheets sync state, shared by every API worker
+-- Each registered sheet keeps the slug -> content_hash (or "deleted") snapshot
+-- of its last successful sync, so a run on any worker, or after a restart,
+-- still deletes rows that were removed from the sheet in the meantime.
+-- Needs import_jobs_schema.sql: runs are serialized with the import write
+-- lease, and the scheduler elects one worker through another lease.
+
+CREATE TABLE IF NOT EXISTS sheet_sync_sheets (
+    sheet_url TEXT PRIMARY KEY,
+    snapshot JSONB, -- NULL until the first successful sync
+    synced_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS sheet_sync_runs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    sheet_url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    run JSONB NOT NULL, -- the API's SheetSyncRun model, report included
+    started_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_sheet_sync_runs_started_at ON sheet_sync_runs(started_at DESC);
@@ -1,4 +1,27 @@
 -- FlowLib Supabase Schema
+--
+-- Base schema. The feature files in this directory are migrations on top of it
+-- and must be applied in this order (later files use tables, columns or
+-- functions from earlier ones):
+--    1. supabase_schema.sql           this file
+--    2. favorites_ratings_schema.sql  favorites and ratings tables
+--    3. import_hash_schema.sql        templates.content_hash (already here for new databases)
+--    4. import_merge_schema.sql       atomic import staging; needs content_hash
+--    5. search_schema.sql             search_vector and search_templates
+--    6. facet_counts_schema.sql       needs search_vector
+--    7. listing_keyset_schema.sql     listing index
+--    8. user_template_data_schema.sql needs favorites and ratings
+--    9. download_counter_schema.sql   increment_template_downloads
+--   10. download_events_schema.sql    needs increment_template_downloads
+--   11. rating_aggregates_schema.sql  rating_sum/count/histogram (already here for new
+--                                     databases); replaces the trigger from step 2
+--   12. favorites_sync_schema.sql     needs favorites
+--   13. updated_at_schema.sql         needs content_hash
+--   14. import_jobs_schema.sql        import jobs and write leases
+--   15. sheet_sync_schema.sql         needs the write leases
+-- The API selects the rating aggregate columns on every read, so step 11 (or
+-- this file) must be in place before it starts. fix_schema.sql only patches
+-- databases created before templates had categories and tools.
 -- Drop existing tables if they exist
 DROP TABLE IF EXISTS templates CASCADE;
 DROP TABLE IF EXISTS categories CASCADE;
@@ -45,12 +68,16 @@ CREATE TABLE templates (
     language TEXT DEFAULT 'pt-BR',
     status TEXT DEFAULT 'draft' CHECK (status IN ('draft', 'published', 'archived')),
     rating_avg DECIMAL(3,2) CHECK (rating_avg >= 0 AND rating_avg <= 5),
+    rating_sum BIGINT NOT NULL DEFAULT 0, -- maintained by rating_aggregates_schema.sql
+    rating_count INTEGER NOT NULL DEFAULT 0,
+    rating_histogram INTEGER[] NOT NULL DEFAULT '{0,0,0,0,0}', -- [n] = number of n-star ratings
     downloads_count INTEGER DEFAULT 0 CHECK (downloads_count >= 0),
     tags TEXT,
     notes TEXT,
     external_id TEXT,
     categories TEXT[] DEFAULT '{}',
     tools TEXT[] DEFAULT '{}',
+    content_hash TEXT, -- hash of the importable fields, used to skip unchanged CSV rows
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
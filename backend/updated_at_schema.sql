@@ -0,0 +1,57 @@
+-- Keep templates.updated_at current for every edit, not only CSV imports
+-- The API's catalog index reloads a row when its updated_at changes, so edits
+-- made in the Supabase dashboard or by other scripts must move it too.
+-- Counter-only updates (download flushes, rating aggregates) are left alone:
+-- the index already tracks those columns directly.
+--
+-- content_hash describes the row as the last CSV import wrote it. An edit of an
+-- importable column that does not set a new hash clears it, so re-importing
+-- the sheet sees the row as changed and restores it instead of skipping it
+-- as unchanged. Imports always write the hash with the columns, so they keep it.
+
+CREATE OR REPLACE FUNCTION touch_template_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS templates_touch_updated_at ON templates;
+CREATE TRIGGER templates_touch_updated_at
+    BEFORE UPDATE ON templates
+    FOR EACH ROW
+    WHEN (
+        (to_jsonb(OLD) - 'updated_at' - 'search_vector' - 'downloads_count'
+            - 'rating_avg' - 'rating_sum' - 'rating_count' - 'rating_histogram')
+        IS DISTINCT FROM
+        (to_jsonb(NEW) - 'updated_at' - 'search_vector' - 'downloads_count'
+            - 'rating_avg' - 'rating_sum' - 'rating_count' - 'rating_histogram')
+    )
+    EXECUTE FUNCTION touch_template_updated_at();
+
+CREATE OR REPLACE FUNCTION clear_edited_template_content_hash()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.content_hash := NULL;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS templates_clear_edited_content_hash ON templates;
+CREATE TRIGGER templates_clear_edited_content_hash
+    BEFORE UPDATE ON templates
+    FOR EACH ROW
+    WHEN (
+        NEW.content_hash IS NOT DISTINCT FROM OLD.content_hash
+        AND (OLD.slug, OLD.title, OLD.description, OLD.platform, OLD.author_name,
+             OLD.author_email, OLD.tutorial_url, OLD.preview_image_url, OLD.download_url,
+             OLD.json_url, OLD.language, OLD.status, OLD.tags, OLD.notes,
+             OLD.external_id, OLD.categories, OLD.tools)
+        IS DISTINCT FROM
+            (NEW.slug, NEW.title, NEW.description, NEW.platform, NEW.author_name,
+             NEW.author_email, NEW.tutorial_url, NEW.preview_image_url, NEW.download_url,
+             NEW.json_url, NEW.language, NEW.status, NEW.tags, NEW.notes,
+             NEW.external_id, NEW.categories, NEW.tools)
+    )
+    EXECUTE FUNCTION clear_edited_template_content_hash();
@@ -0,0 +1,16 @@
+-- Page-scoped user data for /api/templates?user_id=...
+-- Returns favorite/rating state for just the given template ids in a single
+-- round trip; both lookups hit the UNIQUE(user_id, template_id) indexes.
+CREATE OR REPLACE FUNCTION get_user_template_data(p_user_id text, p_template_ids uuid[])
+RETURNS TABLE(template_id uuid, is_favorited boolean, rating integer) AS $$
+    SELECT ids.template_id,
+           EXISTS (
+               SELECT 1 FROM favorites f
+               WHERE f.user_id = p_user_id AND f.template_id = ids.template_id
+           ),
+           (
+               SELECT r.rating FROM ratings r
+               WHERE r.user_id = p_user_id AND r.template_id = ids.template_id
+           )
+    FROM unnest(p_template_ids) AS ids(template_id);
+$$ LANGUAGE sql STABLE;
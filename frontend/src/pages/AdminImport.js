@@ -136,19 +136,20 @@ const AdminImport = () => {
     setLoading(true);
     try {
       const formData = new FormData();
+      let importUrl = getApiEndpoint('');
       
-      if (selectedFile) {
+      if (previewData?.preview_token) {
+        // The server kept the validated preview: commit it without re-uploading
+        formData.append('preview_token', previewData.preview_token);
+        importUrl = `${API}/import/commit`;
+      } else if (selectedFile) {
         formData.append('file', selectedFile);
       } else if (sheetUrl) {
-        // For import, we need to re-upload the file since the preview endpoint doesn't store it
-        if (sheetUrl) {
-          // Convert Google Sheets URL to CSV export URL and fetch
-          toast.error('Importação direta via URL do Google Sheets não suportada ainda. Use o arquivo CSV.');
-          return;
-        }
+        toast.error('Valide a planilha novamente antes de importar.');
+        return;
       }
 
-      const response = await fetch(getApiEndpoint(''), {
+      const response = await fetch(importUrl, {
         method: 'POST',
         body: formData,
       });
@@ -161,6 +162,8 @@ const AdminImport = () => {
       const data = await response.json();
       setFinalReport(data);
       setImportCompleted(true);
+      // Preview tokens are single use
+      setPreviewData((prev) => (prev ? { ...prev, preview_token: null } : prev));
       
       const successCount = data.inserted + data.updated + data.deleted;
       toast.success(`Importação concluída! ${successCount} operações realizadas`);
@@ -507,7 +510,7 @@ delete,agente-antigo,,,,,`;
             <h3 className="text-lg font-semibold mb-4">Prévia da Importação</h3>
             
             {/* Summary */}
-            <div className="grid grid-cols-2 md:grid-cols-5 gap-4 mb-6">
+            <div className="grid grid-cols-2 md:grid-cols-6 gap-4 mb-6">
               <div className="bg-white/5 rounded-lg p-3 text-center">
                 <div className="text-2xl font-bold text-white">{previewData.total_rows}</div>
                 <div className="text-xs text-white/60">Total</div>
@@ -520,6 +523,10 @@ delete,agente-antigo,,,,,`;
                 <div className="text-2xl font-bold text-blue-400">{previewData.update_count}</div>
                 <div className="text-xs text-blue-400/80">Atualizar</div>
               </div>
+              <div className="bg-white/5 rounded-lg p-3 text-center">
+                <div className="text-2xl font-bold text-white/70">{previewData.unchanged_count}</div>
+                <div className="text-xs text-white/60">Sem alterações</div>
+              </div>
               <div className="bg-red-500/10 rounded-lg p-3 text-center">
                 <div className="text-2xl font-bold text-red-400">{previewData.delete_count}</div>
                 <div className="text-xs text-red-400/80">Deletar</div>
@@ -560,7 +567,7 @@ delete,agente-antigo,,,,,`;
           <div className="bg-white/5 border border-white/10 rounded-xl p-6">
             <h3 className="text-lg font-semibold mb-4">Relatório da Importação</h3>
             
-            <div className="grid grid-cols-2 md:grid-cols-4 gap-4 mb-6">
+            <div className="grid grid-cols-2 md:grid-cols-5 gap-4 mb-6">
               <div className="bg-green-500/10 rounded-lg p-3 text-center">
                 <div className="text-2xl font-bold text-green-400">{finalReport.inserted}</div>
                 <div className="text-xs text-green-400/80">Inseridos</div>
@@ -569,6 +576,10 @@ delete,agente-antigo,,,,,`;
                 <div className="text-2xl font-bold text-blue-400">{finalReport.updated}</div>
                 <div className="text-xs text-blue-400/80">Atualizados</div>
               </div>
+              <div className="bg-white/5 rounded-lg p-3 text-center">
+                <div className="text-2xl font-bold text-white/70">{finalReport.unchanged}</div>
+                <div className="text-xs text-white/60">Sem alterações</div>
+              </div>
               <div className="bg-red-500/10 rounded-lg p-3 text-center">
                 <div className="text-2xl font-bold text-red-400">{finalReport.deleted}</div>
                 <div className="text-xs text-red-400/80">Deletados</div>
@@ -0,0 +1,162 @@
+import copy
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py connects at import time; these only need to look valid
+os.environ.setdefault('SUPABASE_URL', 'http://localhost:54321')
+os.environ.setdefault('SUPABASE_SERVICE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.test')
+os.environ.setdefault('DOWNLOAD_JOURNAL_DIR', tempfile.mkdtemp())
+os.environ.setdefault('SHEET_SYNC_INTERVAL_SECONDS', '0')
+
+import server  # noqa: E402
+
+
+class FakeResult:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """Just enough of the postgrest query builder for the import and sync paths"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.op = 'select'
+        self.filters = []
+        self.payload = None
+        self.on_conflict = None
+        self.window = None
+
+    def select(self, columns='*', count=None):
+        self.op = 'select'
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(('eq', column, value))
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(('is', column, None if value == 'null' else value))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(('lt', column, value))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(('in', column, list(values)))
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end)
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict='id', **kwargs):
+        self.op, self.payload, self.on_conflict = 'upsert', payload, on_conflict
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = 'update', payload
+        return self
+
+    def delete(self):
+        self.op = 'delete'
+        return self
+
+    def _matches(self, row):
+        for kind, column, value in self.filters:
+            if kind == 'eq' and row.get(column) != value:
+                return False
+            if kind == 'in' and row.get(column) not in value:
+                return False
+            if kind == 'is' and row.get(column) is not value:
+                return False
+            if kind == 'lt' and not (row.get(column) is not None and row.get(column) < value):
+                return False
+        return True
+
+    def execute(self):
+        rows = self.client.tables.setdefault(self.table, [])
+        self.client.calls.append((self.table, self.op, copy.deepcopy(self.filters)))
+
+        if self.op == 'select':
+            matched = [row for row in rows if self._matches(row)]
+            if self.window:
+                matched = matched[self.window[0]:self.window[1] + 1]
+            return FakeResult(copy.deepcopy(matched))
+        if self.op == 'delete':
+            removed = [row for row in rows if self._matches(row)]
+            self.client.tables[self.table] = [row for row in rows if not self._matches(row)]
+            return FakeResult(removed)
+
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        if self.op == 'update':
+            for row in rows:
+                if self._matches(row):
+                    row.update(payload[0])
+            return FakeResult(payload)
+        for item in payload:
+            existing = None
+            if self.op == 'upsert':
+                existing = next((row for row in rows if row.get(self.on_conflict) == item.get(self.on_conflict)), None)
+            if existing is not None:
+                existing.update(item)
+            else:
+                rows.append({'id': str(uuid.uuid4()), **item})
+        return FakeResult(payload)
+
+
+class FakeRPC:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.client.calls.append(('rpc', self.name, self.params))
+        handler = self.client.rpcs.get(self.name)
+        return FakeResult(handler(self.params) if handler else [])
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+        # Single-worker defaults: the write lease is always free
+        self.rpcs = {'try_acquire_write_lease': lambda params: True}
+        self.calls = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeRPC(self, name, params or {})
+
+    def writes(self, table='templates'):
+        return [call for call in self.calls if call[0] == table and call[1] != 'select']
+
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    client = FakeSupabase()
+    monkeypatch.setattr(server, 'supabase', client)
+    return client
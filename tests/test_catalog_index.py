@@ -0,0 +1,42 @@
+import server
+
+
+def template_row(template_id, updated_at='2026-01-01T00:00:00+00:00', **fields):
+    return {
+        'id': template_id, 'slug': template_id, 'title': template_id, 'platform': 'n8n',
+        'status': 'published', 'downloads_count': 0, 'rating_avg': None, 'rating_count': 0,
+        'categories': [], 'tools': [], 'updated_at': updated_at, **fields
+    }
+
+
+def reloaded_ids(fake_supabase):
+    return [
+        value for table, op, filters in fake_supabase.calls
+        if table == 'templates' and op == 'select'
+        for kind, _, values in filters if kind == 'in'
+        for value in values
+    ]
+
+
+def test_refresh_reloads_only_rows_edited_since_last_build(fake_supabase):
+    fake_supabase.tables['templates'] = [template_row('a'), template_row('b')]
+    index = server.refresh_catalog_index(None)
+    fake_supabase.calls.clear()
+
+    # An edit made outside the import leaves content_hash alone but moves updated_at
+    fake_supabase.tables['templates'][1].update(title='b v2', updated_at='2026-01-02T00:00:00+00:00')
+    refreshed = server.refresh_catalog_index(index)
+
+    assert reloaded_ids(fake_supabase) == ['b']
+    assert refreshed.rows_by_id['a'] is index.rows_by_id['a']
+    assert refreshed.rows_by_id['b']['title'] == 'b v2'
+
+
+def test_refresh_without_changes_reloads_nothing(fake_supabase):
+    fake_supabase.tables['templates'] = [template_row('a'), template_row('b')]
+    index = server.refresh_catalog_index(None)
+    fake_supabase.calls.clear()
+
+    server.refresh_catalog_index(index)
+
+    assert reloaded_ids(fake_supabase) == []
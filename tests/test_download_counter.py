@@ -0,0 +1,89 @@
+import pytest
+
+import server
+
+MINUTE = '2026-01-01T10:00:00+00:00'
+
+
+@pytest.fixture
+def counter(tmp_path):
+    counter = server.DownloadCounter(tmp_path)
+    yield counter
+    counter.close()
+
+
+def write_orphan(journal_dir, name, journal='', flushing=None):
+    (journal_dir / f'{name}.lock').write_text('')
+    (journal_dir / f'{name}.log').write_text(journal)
+    if flushing is not None:
+        (journal_dir / f'{name}.log.flushing').write_text(flushing)
+
+
+def test_recover_adopts_journal_of_exited_worker(tmp_path, counter):
+    write_orphan(tmp_path, 'downloads-1-aaaaaa', f't1 2 {MINUTE}\nt2 1 {MINUTE}\n', flushing=f't1 3 {MINUTE}\n')
+
+    assert counter.recover() == 6
+    assert counter.pending == {('t1', MINUTE): 5, ('t2', MINUTE): 1}
+    assert not list(tmp_path.glob('downloads-1-aaaaaa*'))
+    # Adopted clicks are in this worker's own journal before the orphan is removed
+    assert counter._read_journal(counter.journal_path) == counter.pending
+
+
+def test_recover_skips_journal_of_running_worker(tmp_path, counter):
+    other = server.DownloadCounter(tmp_path)
+    other.record('t1')
+
+    assert counter.recover() == 0
+    assert other.journal_path.exists()
+    other.close()
+
+
+def test_flush_sends_batch_and_bumps_downloads_version(counter, fake_supabase):
+    counter.record('t1')
+    counter.record('t1')
+    catalog_version, downloads_version = server.catalog_version, server.downloads_version
+
+    assert counter.flush() == 2
+
+    (_, name, params), = fake_supabase.calls
+    assert name == 'record_download_batch'
+    assert params['p_template_ids'] == ['t1'] and params['p_counts'] == [2]
+    assert counter.pending == {}
+    assert not counter.flushing_path.exists()
+    assert server.catalog_version == catalog_version
+    assert server.downloads_version == downloads_version + 1
+
+
+def test_failed_flush_requeues_batch(counter, fake_supabase):
+    def fail(params):
+        raise RuntimeError('database unavailable')
+
+    fake_supabase.rpcs['record_download_batch'] = fail
+    counter.record('t1')
+    minute = next(iter(counter.pending))[1]
+
+    with pytest.raises(RuntimeError):
+        counter.flush()
+
+    assert counter.pending == {('t1', minute): 1}
+    assert not counter.flushing_path.exists()
+    assert counter._read_journal(counter.journal_path) == {('t1', minute): 1}
+
+    del fake_supabase.rpcs['record_download_batch']
+    assert counter.flush() == 1
+    assert counter.pending == {}
+
+
+def test_close_removes_files_only_when_nothing_is_pending(tmp_path):
+    flushed = server.DownloadCounter(tmp_path)
+    flushed.recover()
+    flushed.close()
+    assert list(tmp_path.iterdir()) == []
+
+    unflushed = server.DownloadCounter(tmp_path)
+    unflushed.record('t1')
+    unflushed.close()
+
+    restarted = server.DownloadCounter(tmp_path)
+    assert restarted.recover() == 1
+    restarted.close()
@@ -0,0 +1,96 @@
+from io import BytesIO
+
+import server
+
+HEADER = 'action,slug,title,platform\n'
+
+
+def run_import(csv_text):
+    report = server.ImportReport()
+    return server.run_template_import(BytesIO((HEADER + csv_text).encode('utf-8')), report)
+
+
+def templates_by_slug(fake_supabase):
+    return {row['slug']: row for row in fake_supabase.tables.get('templates', [])}
+
+
+def test_repeated_slug_is_written_once_with_the_last_line(fake_supabase):
+    report = run_import('upsert,aa,First,n8n\nupsert,aa,Second,n8n\n')
+
+    assert (report.inserted, report.updated, report.errors) == (1, 1, [])
+    assert len(fake_supabase.writes()) == 1
+    assert templates_by_slug(fake_supabase)['aa']['title'] == 'Second'
+
+
+def test_delete_then_reinsert_replaces_the_row(fake_supabase):
+    run_import('upsert,aa,Original,n8n\n')
+    original_id = templates_by_slug(fake_supabase)['aa']['id']
+
+    report = run_import('delete,aa,,\nupsert,aa,Reinserted,n8n\n')
+
+    assert (report.deleted, report.inserted, report.errors) == (1, 1, [])
+    row = templates_by_slug(fake_supabase)['aa']
+    assert row['title'] == 'Reinserted'
+    assert row['id'] != original_id
+    # Deletes go out before upserts, matching the file order
+    assert [op for _, op, _ in fake_supabase.writes()][-2:] == ['delete', 'upsert']
+
+
+def test_upsert_then_delete_of_new_slug_leaves_nothing(fake_supabase):
+    report = run_import('upsert,aa,Short lived,n8n\ndelete,aa,,\n')
+
+    assert (report.inserted, report.deleted, report.errors) == (1, 1, [])
+    assert 'aa' not in templates_by_slug(fake_supabase)
+    assert [op for _, op, _ in fake_supabase.writes()] == ['delete']
+
+
+def test_delete_of_unknown_slug_is_reported(fake_supabase):
+    report = run_import('delete,missing,,\n')
+
+    assert report.deleted == 0
+    assert report.errors == ["Linha 2: Template com slug 'missing' não encontrado para exclusão"]
+
+
+def test_reimporting_same_rows_writes_nothing(fake_supabase):
+    run_import('upsert,aa,Template A,n8n\n')
+    fake_supabase.calls.clear()
+
+    report = run_import('upsert,aa,Template A,n8n\n')
+
+    assert report.unchanged == 1
+    assert fake_supabase.writes() == []
+
+
+def test_parse_error_in_later_chunk_returns_partial_report(fake_supabase, monkeypatch):
+    monkeypatch.setattr(server, 'IMPORT_CHUNK_SIZE', 2)
+    rows = ''.join(f'upsert,t{i},Template {i},n8n\n' for i in range(3))
+
+    report = run_import(rows + 'upsert,bad,Bad,n8n,extra,fields\n')
+
+    # The first chunk was written before the bad line was reached
+    assert report.inserted == 2
+    assert report.errors[0].startswith('Linha 5: Erro ao fazer parse do CSV')
+    assert 'Importação interrompida' in report.errors[-1]
+    assert sorted(templates_by_slug(fake_supabase)) == ['t0', 't1']
+
+
+def test_numeric_looking_columns_do_not_depend_on_chunk_boundaries(fake_supabase, monkeypatch):
+    monkeypatch.setattr(server, 'IMPORT_CHUNK_SIZE', 2)
+    header_with_id = 'action,slug,title,platform,external_id\n'
+    csv_text = header_with_id + 'upsert,aa,A,n8n,1000\nupsert,bb,B,n8n,1001\nupsert,cc,C,n8n,\nupsert,dd,D,n8n,2001\n'
+
+    report = server.run_template_import(BytesIO(csv_text.encode('utf-8')), server.ImportReport())
+
+    assert report.errors == []
+    external_ids = {slug: row['external_id'] for slug, row in templates_by_slug(fake_supabase).items()}
+    assert external_ids == {'aa': '1000', 'bb': '1001', 'cc': None, 'dd': '2001'}
+
+
+def test_row_with_cleared_hash_is_rewritten(fake_supabase):
+    run_import('upsert,aa,Template A,n8n\n')
+    templates_by_slug(fake_supabase)['aa'].update(title='Edited', content_hash=None)
+
+    report = run_import('upsert,aa,Template A,n8n\n')
+
+    assert report.updated == 1
+    assert templates_by_slug(fake_supabase)['aa']['title'] == 'Template A'
@@ -0,0 +1,39 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import server
+
+CSV = b'action,slug,title,platform\nupsert,aa,Template A,n8n\n'
+
+
+def test_job_status_is_readable_from_another_worker(fake_supabase, monkeypatch):
+    monkeypatch.setattr(server, 'import_jobs', {})
+    client = TestClient(server.app)
+
+    submitted = client.post('/api/import/jobs', files={'file': ('t.csv', CSV, 'text/csv')}).json()
+
+    # A worker that never saw the upload only has the import_jobs table
+    server.import_jobs.clear()
+    job = client.get(f"/api/import/jobs/{submitted['id']}").json()
+
+    assert job['status'] == 'completed'
+    assert job['report']['inserted'] == 1
+    assert client.get(f'/api/import/jobs/{server.uuid.uuid4()}').status_code == 404
+
+
+def test_write_lease_waits_for_other_holder_and_releases(fake_supabase, monkeypatch):
+    monkeypatch.setattr(server, 'WRITE_LEASE_POLL_SECONDS', 0)
+    answers = iter([False, False, True])
+    fake_supabase.rpcs['try_acquire_write_lease'] = lambda params: next(answers)
+    lease = server.WriteLease('test')
+
+    async def scenario():
+        async with lease:
+            assert lease.local.locked()
+
+    asyncio.run(scenario())
+
+    rpc_names = [call[1] for call in fake_supabase.calls if call[0] == 'rpc']
+    assert rpc_names == ['try_acquire_write_lease'] * 3 + ['release_write_lease']
+    assert not lease.local.locked()
@@ -0,0 +1,39 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(server.ranked_lists_state, 'version', (1, 1))
+    monkeypatch.setitem(server.ranked_lists_state, 'built_at', 100.0)
+    monkeypatch.setitem(server.ranked_lists_state, 'lists', {name: [] for name in server.RANKED_LIST_NAMES})
+    # No startup hooks: the background loops must not rebuild the snapshot under the test
+    return TestClient(server.app)
+
+
+def test_rail_etag_follows_snapshot_not_catalog_version(client):
+    etag = client.get('/api/rails/newest').headers['etag']
+
+    server.bump_catalog_version()
+    assert client.get('/api/rails/newest', headers={'If-None-Match': etag}).status_code == 304
+
+    server.ranked_lists_state.update(version=(server.catalog_version, 1), built_at=200.0)
+    response = client.get('/api/featured', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['etag'] != etag
+
+
+def test_template_etag_changes_after_download_flush(client, fake_supabase):
+    fake_supabase.tables['templates'] = [{
+        'id': 't1', 'slug': 'aa', 'title': 'A', 'platform': 'n8n', 'status': 'published', 'downloads_count': 3
+    }]
+    categories_etag = client.get('/api/categories').headers['etag']
+    etag = client.get('/api/templates/t1').headers['etag']
+
+    server.bump_downloads_version()
+
+    assert client.get('/api/templates/t1', headers={'If-None-Match': etag}).status_code == 200
+    # Bodies without download counts keep their tag
+    assert client.get('/api/categories', headers={'If-None-Match': categories_etag}).status_code == 304
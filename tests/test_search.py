@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+
+import server
+
+
+def search(fake_supabase, rows, offset):
+    fake_supabase.rpcs['search_templates'] = lambda params: rows
+    return server.search_templates_page('zapier', None, None, None, 15, offset)
+
+
+def test_page_past_last_match_still_reports_total(fake_supabase):
+    templates, total = search(fake_supabase, [{'template': None, 'rank': None, 'total': 7}], offset=30)
+
+    assert templates == []
+    assert total == 7
+
+
+def test_page_of_matches_returns_templates_and_total(fake_supabase):
+    rows = [{'template': {'id': 't1'}, 'rank': 0.5, 'total': 7}, {'template': {'id': 't2'}, 'rank': 0.4, 'total': 7}]
+
+    templates, total = search(fake_supabase, rows, offset=0)
+
+    assert [template['id'] for template in templates] == ['t1', 't2']
+    assert total == 7
+
+
+def test_cursor_with_search_is_rejected(fake_supabase):
+    cursor = server.encode_listing_cursor({'downloads_count': 10, 'id': str(server.uuid.uuid4())})
+    response = TestClient(server.app).get('/api/templates', params={'search': 'zapier', 'cursor': cursor})
+
+    assert response.status_code == 400
+    assert fake_supabase.calls == []
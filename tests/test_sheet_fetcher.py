@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+
+URL = 'https://docs.google.com/spreadsheets/d/test/export?format=csv'
+CSV = b'action,slug,title,platform\nupsert,aa,Template A,n8n\n'
+
+
+def fetcher_for(handler, **kwargs):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return server.SheetFetcher(client=client, **kwargs)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_unchanged_sheet_is_revalidated_and_reused():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.headers.get('If-None-Match') == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=CSV, headers={'ETag': '"v1"'})
+
+    fetcher = fetcher_for(handler)
+
+    async def scenario():
+        first = await fetcher.fetch(URL)
+        assert first["not_modified"] is False and first["content"] == CSV
+        first["parsed"] = 'parsed frame'
+        second = await fetcher.fetch(URL)
+        await fetcher.aclose()
+        return first, second
+
+    first, second = run(scenario())
+
+    assert second is first
+    assert second["not_modified"] is True
+    assert second["parsed"] == 'parsed frame'
+    assert 'If-None-Match' not in requests[0].headers
+    assert requests[1].headers['If-None-Match'] == '"v1"'
+
+
+def test_response_without_validators_is_not_cached():
+    fetcher = fetcher_for(lambda request: httpx.Response(200, content=CSV))
+
+    async def scenario():
+        entry = await fetcher.fetch(URL)
+        await fetcher.aclose()
+        return entry
+
+    assert run(scenario())["content"] == CSV
+    assert fetcher.cache == {}
+
+
+def test_declared_size_over_cap_is_rejected():
+    fetcher = fetcher_for(lambda request: httpx.Response(200, content=CSV * 10), max_bytes=len(CSV))
+
+    with pytest.raises(ValueError, match='tamanho máximo'):
+        run(fetcher.fetch(URL))
+
+
+def test_streamed_size_over_cap_is_rejected():
+    async def chunks():
+        for _ in range(10):
+            yield CSV
+
+    # No Content-Length: the cap has to be enforced while streaming
+    fetcher = fetcher_for(lambda request: httpx.Response(200, content=chunks()), max_bytes=len(CSV) * 3)
+
+    with pytest.raises(ValueError, match='tamanho máximo'):
+        run(fetcher.fetch(URL))
+    assert fetcher.cache == {}
+
+
+def test_http_error_is_reported_as_value_error():
+    fetcher = fetcher_for(lambda request: httpx.Response(404))
+
+    with pytest.raises(ValueError, match='Erro ao buscar CSV'):
+        run(fetcher.fetch(URL))
@@ -0,0 +1,120 @@
+from io import BytesIO
+
+import pytest
+
+import server
+
+SHEET_URL = 'https://docs.google.com/spreadsheets/d/test/edit'
+
+HEADER = 'action,slug,title,platform,tutorial_url\n'
+GOOD_SHEET = HEADER + (
+    'upsert,aa,Template A,n8n,https://example.com/a\n'
+    'upsert,bb,Template B,n8n,https://example.com/b\n'
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_sync_state():
+    server.sheet_sync_state.clear()
+    yield
+    server.sheet_sync_state.clear()
+
+
+def sync(csv_text):
+    df, validation_errors = server.parse_import_csv(BytesIO(csv_text.encode('utf-8')))
+    run = server.SheetSyncRun(sheet_url=SHEET_URL)
+    snapshot = server.apply_sheet_diff(SHEET_URL, df, validation_errors, run)
+    if snapshot is not None:
+        server.save_sheet_snapshot(SHEET_URL, snapshot)
+    return run, snapshot
+
+
+def template_slugs(fake_supabase):
+    return sorted(row['slug'] for row in fake_supabase.tables.get('templates', []))
+
+
+def test_first_sync_inserts_every_row(fake_supabase):
+    run, snapshot = sync(GOOD_SHEET)
+
+    assert run.report.inserted == 2
+    assert run.report.errors == []
+    assert set(snapshot) == {'aa', 'bb'}
+    assert template_slugs(fake_supabase) == ['aa', 'bb']
+
+
+def test_unchanged_sheet_writes_nothing(fake_supabase):
+    sync(GOOD_SHEET)
+    fake_supabase.calls.clear()
+
+    run, _ = sync(GOOD_SHEET)
+
+    assert run.rows_changed == 0
+    assert fake_supabase.writes() == []
+
+
+def test_invalid_row_is_not_deleted_and_snapshot_is_kept(fake_supabase):
+    _, first_snapshot = sync(GOOD_SHEET)
+    fake_supabase.calls.clear()
+
+    run, snapshot = sync(GOOD_SHEET.replace('https://example.com/b', 'badurl'))
+
+    assert run.report.errors
+    assert run.report.deleted == 0
+    assert fake_supabase.writes() == []
+    assert template_slugs(fake_supabase) == ['aa', 'bb']
+    assert snapshot is None
+    assert server.load_sheet_snapshot(SHEET_URL) == first_snapshot
+
+
+def test_row_removed_from_sheet_is_deleted(fake_supabase):
+    sync(GOOD_SHEET)
+
+    run, snapshot = sync(HEADER + 'upsert,aa,Template A,n8n,https://example.com/a\n')
+
+    assert run.report.deleted == 1
+    assert template_slugs(fake_supabase) == ['aa']
+    assert set(snapshot) == {'aa'}
+
+
+def test_changed_row_is_updated(fake_supabase):
+    sync(GOOD_SHEET)
+
+    run, _ = sync(GOOD_SHEET.replace('Template B', 'Template B v2'))
+
+    assert run.report.updated == 1
+    assert run.rows_changed == 1
+    titles = {row['slug']: row['title'] for row in fake_supabase.tables['templates']}
+    assert titles['bb'] == 'Template B v2'
+
+
+def test_removed_row_is_deleted_by_a_worker_that_never_synced(fake_supabase):
+    sync(GOOD_SHEET)
+    # A restarted or different worker: nothing in memory, only the stored snapshot
+    server.sheet_sync_state.clear()
+
+    run, _ = sync(HEADER + 'upsert,aa,Template A,n8n,https://example.com/a\n')
+
+    assert run.report.deleted == 1
+    assert template_slugs(fake_supabase) == ['aa']
+
+
+def test_registered_sheets_are_shared_through_the_table(fake_supabase, monkeypatch):
+    monkeypatch.setattr(server, 'sheet_sync_urls', ['https://docs.google.com/spreadsheets/d/env/edit'])
+
+    server.register_sheet(SHEET_URL)
+    server.register_sheet(SHEET_URL)
+
+    assert server.registered_sheet_urls() == ['https://docs.google.com/spreadsheets/d/env/edit', SHEET_URL]
+
+
+def test_row_edited_outside_the_import_is_restored(fake_supabase):
+    sync(GOOD_SHEET)
+    # What the updated_at_schema.sql trigger leaves after a dashboard edit
+    edited = next(row for row in fake_supabase.tables['templates'] if row['slug'] == 'bb')
+    edited.update(title='Edited in dashboard', content_hash=None)
+
+    run, _ = sync(GOOD_SHEET)
+
+    assert run.report.updated == 1
+    assert edited['title'] == 'Template B'
+    assert edited['content_hash'] is not None
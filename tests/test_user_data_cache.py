@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+import pytest
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def clean_user_data_cache():
+    server.user_data_cache.clear()
+    server.user_data_loads.clear()
+    yield
+    server.user_data_cache.clear()
+    server.user_data_loads.clear()
+
+
+@pytest.fixture
+def slow_load(monkeypatch):
+    """load_user_data that blocks until released and counts its calls"""
+    state = {"calls": 0, "release": threading.Event(), "favorites": {'t1'}}
+
+    def load_user_data(user_id):
+        state["calls"] += 1
+        state["release"].wait(5)
+        return set(state["favorites"]), {}
+
+    monkeypatch.setattr(server, 'load_user_data', load_user_data)
+    return state
+
+
+def test_concurrent_readers_share_one_load(slow_load):
+    async def scenario():
+        readers = [asyncio.create_task(server.get_user_favorites('u1')) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        slow_load["release"].set()
+        return await asyncio.gather(*readers)
+
+    results = asyncio.run(scenario())
+
+    assert slow_load["calls"] == 1
+    assert all(result == {"template_ids": ['t1']} for result in results)
+    assert server.user_data_cache['u1']["favorites"] == {'t1'}
+    assert server.user_data_loads == {}
+
+
+def test_write_during_load_keeps_stale_read_out_of_cache(slow_load):
+    async def scenario():
+        reader = asyncio.create_task(server.get_user_favorites('u1'))
+        await asyncio.sleep(0.05)
+        server.note_user_data_write('u1')
+        slow_load["release"].set()
+        await reader
+
+        # The next reader starts a fresh load instead of trusting the stale one
+        slow_load["favorites"] = {'t1', 't2'}
+        return await server.get_user_favorites('u1')
+
+    result = asyncio.run(scenario())
+
+    assert slow_load["calls"] == 2
+    assert sorted(result["template_ids"]) == ['t1', 't2']
+    assert server.user_data_cache['u1']["favorites"] == {'t1', 't2'}
+
+
+def page_lookups(fake_supabase):
+    return [call[2]['p_template_ids'] for call in fake_supabase.calls if call[:2] == ('rpc', 'get_user_template_data')]
+
+
+def test_page_lookups_are_cached_per_template(fake_supabase):
+    fake_supabase.rpcs['get_user_template_data'] = lambda params: [
+        {'template_id': template_id, 'is_favorited': template_id == 't1', 'rating': 4 if template_id == 't2' else None}
+        for template_id in params['p_template_ids']
+    ]
+
+    first = asyncio.run(server.fetch_user_template_data('u1', ['t1', 't2']))
+    second = asyncio.run(server.fetch_user_template_data('u1', ['t2', 't3']))
+
+    assert first == ({'t1'}, {'t2': 4})
+    assert second == ({'t1'}, {'t2': 4})
+    # Only the template not seen before is looked up; no full-history load is started
+    assert page_lookups(fake_supabase) == [['t1', 't2'], ['t3']]
+    assert server.user_data_loads == {}
+    assert not [call for call in fake_supabase.calls if call[0] == 'favorites']
+
+
+def test_write_during_page_lookup_is_not_merged(fake_supabase):
+    def lookup(params):
+        server.note_user_data_write('u1')
+        return [{'template_id': 't1', 'is_favorited': True, 'rating': None}]
+
+    fake_supabase.rpcs['get_user_template_data'] = lookup
+
+    assert asyncio.run(server.fetch_user_template_data('u1', ['t1'])) == ({'t1'}, {})
+    assert 'u1' not in server.user_data_cache
+
+
+def test_full_load_pages_past_max_rows(fake_supabase, monkeypatch):
+    monkeypatch.setattr(server, 'USER_DATA_LOAD_PAGE_SIZE', 2)
+    fake_supabase.tables['favorites'] = [{'user_id': 'u1', 'template_id': f't{i}'} for i in range(5)]
+    fake_supabase.tables['ratings'] = [{'user_id': 'u1', 'template_id': 't0', 'rating': 5}]
+
+    favorites, ratings = server.load_user_data('u1')
+
+    assert favorites == {f't{i}' for i in range(5)}
+    assert ratings == {'t0': 5}
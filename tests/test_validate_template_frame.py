@@ -0,0 +1,84 @@
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import server
+
+COLUMNS = ['action', 'slug', 'title', 'platform', 'tutorial_url', 'rating_avg', 'downloads_count']
+VALID = {'action': 'upsert', 'slug': 'ok-slug_1', 'title': 'T', 'platform': 'n8n',
+         'tutorial_url': 'https://example.com', 'rating_avg': '4.5', 'downloads_count': '10'}
+
+
+def validate(**overrides):
+    """Validate one CSV row (VALID with overrides) the way the import reads it"""
+    row = {**VALID, **overrides}
+    csv_text = ','.join(COLUMNS) + '\n' + ','.join(row[column] for column in COLUMNS) + '\n'
+    df, errors = server.parse_import_csv(BytesIO(csv_text.encode('utf-8')))
+    return df.to_dict('records')[0], errors[0]
+
+
+@pytest.mark.parametrize('slug, expected_errors', [
+    ('ok-slug_1', []),
+    ('', ['Slug é obrigatório']),
+    ('a', ['Slug deve ter pelo menos 2 caracteres']),
+    ('Bad Slug', ['Slug inválido: Bad Slug (apenas letras minúsculas, números, hífens e underscores)']),
+])
+def test_slug_rules(slug, expected_errors):
+    _, errors = validate(slug=slug)
+    assert errors == expected_errors
+
+
+@pytest.mark.parametrize('url, expected_url, expected_errors', [
+    ('https://example.com/a', 'https://example.com/a', []),
+    ('http://example.com/a', 'http://example.com/a', []),
+    ('/templates/a', '/templates/a', []),
+    ('example.com/a', 'https://example.com/a', []),  # looks like a domain: auto-fixed
+    ('notaurl', 'notaurl', ['tutorial_url parece ser uma URL inválida: notaurl']),
+    ('', '', []),
+])
+def test_url_rules(url, expected_url, expected_errors):
+    row, errors = validate(tutorial_url=url)
+    assert row['tutorial_url'] == expected_url
+    assert errors == expected_errors
+
+
+@pytest.mark.parametrize('downloads, expected', [
+    ('10', 10),
+    ('-5', 0),      # negatives become 0
+    ('3.7', 3),     # decimals are truncated
+    ('-0.5', 0),
+    ('abc', 0),     # not a number becomes 0
+    ('', None),     # blank stays unset
+])
+def test_downloads_count_rules(downloads, expected):
+    row, errors = validate(downloads_count=downloads)
+    assert errors == []
+    if expected is None:
+        assert pd.isna(row['downloads_count'])
+        assert 'downloads_count' not in server.build_template_data(row, row['slug'])
+    else:
+        assert row['downloads_count'] == expected
+        assert server.build_template_data(row, row['slug'])['downloads_count'] == expected
+
+
+@pytest.mark.parametrize('rating, expected', [
+    ('4.5', 4.5),
+    ('7', 5.0),     # clamped to 0-5
+    ('-1', 0.0),
+    ('abc', None),  # not a number is dropped
+    ('', None),
+])
+def test_rating_avg_rules(rating, expected):
+    row, errors = validate(rating_avg=rating)
+    assert errors == []
+    if expected is None:
+        assert pd.isna(row['rating_avg'])
+    else:
+        assert row['rating_avg'] == expected
+
+
+def test_blank_platform_defaults_to_n8n():
+    row, errors = validate(platform='')
+    assert errors == []
+    assert row['platform'] == 'n8n'